@@ -7,23 +7,39 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import streamlit as st
 from plotly.subplots import make_subplots
 
 from config import (
+    ALL_TICKERS,
     ETF_INFO,
     INDICATOR_INFO,
     L1_TICKERS,
-    MACRO_TICKERS,
     PAGE_CONFIG,
     TARGET_ETFS,
     TIME_RANGES,
 )
-from db_manager import fetch_macro, fetch_market_daily
+from db_manager import fetch_all
 from notifications import send_feishu_alert
-from utils import analyze_smh_qqq_rs, calculate_divergence_metrics, get_fear_and_greed, get_stock_data
+from utils import (
+    analyze_smh_qqq_rs,
+    calculate_divergence_metrics,
+    get_cache_stats,
+    get_fear_and_greed,
+    get_stock_data,
+    to_wide,
+)
 from premium_calculator import render_premium_dashboard
 
+# Streamlit serializes figures via plotly.io.to_json; orjson is several times faster than stdlib json
+try:
+    import orjson  # noqa: F401
+
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
 DEBUG_LOG_PATH = "/Users/xiaoye/Projects/investing/.cursor/debug.log"
 
 
@@ -562,6 +578,84 @@ def render_etf_stats(df: pd.DataFrame):
     
     return f'<div style="{container_style}"><div><div style="{label_style}">Latest Price</div><div style="{price_style}">${price:.2f}</div></div><div style="{divider_style}"></div><div><div style="{label_style}">Daily Change</div><div style="{change_style}">{arrow} {sign}{change:.2f} ({sign}{pct_change:.2f}%)</div></div><div style="{divider_style}"></div><div><div style="{label_style}">RSI (14)</div><div style="{rsi_container_style}"><span style="{rsi_value_style}">{rsi:.1f}</span><span style="{rsi_badge_style}">{rsi_status}</span></div></div></div>'
 
+def render_summary_table(summary_df: pd.DataFrame) -> str:
+    if summary_df is None or summary_df.empty:
+        return ""
+
+    rsi = summary_df["RSI (14)"].to_numpy(dtype=float)
+    rsi_styles = np.where(
+        rsi < 30, "background-color:rgba(0,255,0,0.2);color:green;",
+        np.where(rsi > 70, "background-color:rgba(255,0,0,0.2);color:red;", ""),
+    )
+    rsi_text = np.where(np.isnan(rsi), "N/A", np.char.mod("%.1f", rsi))
+
+    # Single-line styles, same as render_etf_stats
+    table_style = "width:100%;border-collapse:collapse;background:#ffffff;border-radius:16px;overflow:hidden;box-shadow:0 4px 6px -1px rgba(0,0,0,0.05);border:1px solid #f1f5f9;margin-bottom:1rem;"
+    th_style = "background:#f8fafc;color:#64748b;font-weight:700;text-transform:uppercase;font-size:0.75rem;letter-spacing:0.05em;padding:10px 14px;text-align:left;border-bottom:1px solid #e2e8f0;"
+    td_style = "font-family:'Source Code Pro',monospace;color:#1f2937;font-size:0.9rem;padding:10px 14px;border-bottom:1px solid #f1f5f9;"
+
+    header = "".join(f'<th style="{th_style}">{c}</th>' for c in summary_df.columns)
+    rows = "".join(
+        f'<tr><td style="{td_style}">{t}</td><td style="{td_style}">{p}</td>'
+        f'<td style="{td_style}{rs}">{rt}</td><td style="{td_style}">{d}</td><td style="{td_style}">{sig}</td></tr>'
+        for t, p, rs, rt, d, sig in zip(
+            summary_df["标的"], summary_df["现价"], rsi_styles, rsi_text, summary_df["年线乖离率"], summary_df["信号"]
+        )
+    )
+    return f'<table style="{table_style}"><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>'
+
+def build_etf_figure(etf_df: pd.DataFrame, time_range: str) -> go.Figure:
+    # Convert index/columns to ndarrays once; every trace shares the same x-axis
+    x_idx = etf_df.index.to_numpy()
+    arr = {c: etf_df[c].to_numpy() for c in etf_df.columns}
+    # MA200 / Bollinger envelope are smooth; plot every Nth point on long ranges (candles stay full-res)
+    n = len(etf_df)
+    stride = max(1, n // 600) if time_range in ("2y", "5y") else 1
+    thin = np.arange(0, n, stride)
+    if n and thin[-1] != n - 1:
+        thin = np.append(thin, n - 1)  # always keep the latest bar so the lines reach the last candle
+    x_thin = x_idx[thin]
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        row_heights=[0.5,0.15,0.15,0.1],
+                        subplot_titles=("Price & MAs","RSI","MACD","Volume"))
+    fig.add_trace(go.Candlestick(x=x_idx, open=arr["Open"], high=arr["High"],
+                                    low=arr["Low"], close=arr["Close"], name="Price"), row=1,col=1)
+    fig.add_trace(go.Scatter(x=x_idx, y=arr["SMA_20"], name="MA20", line=dict(color="#f59e0b")), row=1,col=1)
+    fig.add_trace(go.Scatter(x=x_thin, y=arr["SMA_200"][thin], name="MA200", line=dict(color="#3b82f6")), row=1,col=1)
+    if "BB_Upper" in arr and "BB_Lower" in arr:
+        fig.add_trace(go.Scatter(x=x_thin, y=arr["BB_Upper"][thin], showlegend=False, line=dict(color="#94a3b8", dash="dot", width=0)), row=1,col=1)
+        fig.add_trace(go.Scatter(x=x_thin, y=arr["BB_Lower"][thin], showlegend=False, line=dict(color="#94a3b8", dash="dot", width=0),
+                                    fill="tonexty", fillcolor="rgba(148, 163, 184, 0.1)"), row=1,col=1)
+    fig.add_trace(go.Scatter(x=x_idx, y=arr["RSI"], name="RSI", line=dict(color="#8b5cf6")), row=2,col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="#e11d48", row=2,col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="#10b981", row=2,col=1)
+    if "MACD_Hist" in arr:
+        fig.add_trace(go.Bar(x=x_idx, y=arr["MACD_Hist"], name="MACD Hist",
+                                marker_color=np.where(arr["MACD_Hist"] >= 0, "#10b981", "#e11d48")), row=3,col=1)
+    if "MACD" in arr:
+        fig.add_trace(go.Scatter(x=x_idx, y=arr["MACD"], name="MACD", line=dict(color="#3b82f6")), row=3,col=1)
+    if "MACD_Signal" in arr:
+        fig.add_trace(go.Scatter(x=x_idx, y=arr["MACD_Signal"], name="Signal", line=dict(color="#f59e0b")), row=3,col=1)
+    if "Volume" in arr:
+        colors = np.where(arr["Open"] - arr["Close"] >= 0, "#e11d48", "#10b981")
+        fig.add_trace(go.Bar(x=x_idx, y=arr["Volume"], name="Volume", marker_color=colors), row=4,col=1)
+
+    # Apply custom theme
+    fig.update_layout(
+        height=700,
+        template="plotly_white",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font=dict(family="Lato, sans-serif", color="#64748b"),
+        xaxis_rangeslider_visible=False,
+        legend=dict(orientation="h", y=1.02),
+        margin=dict(l=10, r=10, t=30, b=10),
+    )
+    fig.update_xaxes(gridcolor="#f1f5f9", linecolor="#e2e8f0")
+    fig.update_yaxes(gridcolor="#f1f5f9", linecolor="#e2e8f0")
+    return fig
+
+
 def render_insight_card(title, content, type="warning"):
     colors = {
         "warning": {"bg": "#fffbeb", "border": "#f59e0b", "icon": "⚡️"},
@@ -592,20 +686,13 @@ def render_insight_card(title, content, type="warning"):
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-def analyze_signal(row):
-    rsi = row.get("RSI")
-    dist = row.get("Dist_MA200_Pct")
-    if rsi is None or dist is None:
-        return "数据不足"
-    if dist < 0 and rsi < 35:
-        return "🟢 极佳买点 (加倍)"
-    if rsi < 30:
-        return "🟢 超卖反弹 (买入)"
-    if rsi > 75:
-        return "🔴 严重超买 (警惕)"
-    if dist > 0.20:
-        return "🟠 估值过高 (持有)"
-    return "⚪️ 正常定投"
+def analyze_signals(rsi: np.ndarray, dist: np.ndarray) -> np.ndarray:
+    """Vectorized AlphaPilot signal ladder; first matching rule wins."""
+    return np.select(
+        [np.isnan(rsi) | np.isnan(dist), (dist < 0) & (rsi < 35), rsi < 30, rsi > 75, dist > 0.20],
+        ["数据不足", "🟢 极佳买点 (加倍)", "🟢 超卖反弹 (买入)", "🔴 严重超买 (警惕)", "🟠 估值过高 (持有)"],
+        default="⚪️ 正常定投",
+    )
 
 
 def ensure_indicators(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
@@ -617,8 +704,8 @@ def ensure_indicators(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
         df["SMA_200"] = df["Close"].rolling(200).mean()
     if "RSI" not in df:
         delta = df["Close"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        gain = delta.clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
         rs = gain / loss
         df["RSI"] = 100 - (100 / (1 + rs))
     if "Dist_MA200_Pct" not in df:
@@ -635,9 +722,9 @@ def _daterange_start(time_range: str) -> dt.date:
     return today - dt.timedelta(days=365 * 2)
 
 
-def load_market_data(time_range: str):
+def load_market_data(time_range: str, market_df: Optional[pd.DataFrame]):
     start_date = _daterange_start(time_range)
-    tickers = sorted(set(TARGET_ETFS + MACRO_TICKERS + L1_TICKERS))
+    tickers = ALL_TICKERS
 
     stock_data: Dict[str, pd.DataFrame] = {}
     pivot_close = None
@@ -658,7 +745,6 @@ def load_market_data(time_range: str):
     })
     #endregion
 
-    market_df = fetch_market_daily(tickers, start=start_date.isoformat())
     if market_df is not None and not market_df.empty:
         market_df["date"] = pd.to_datetime(market_df["date"])
         pivot_close = market_df.pivot(index="date", columns="ticker", values="close").sort_index()
@@ -734,19 +820,15 @@ def load_market_data(time_range: str):
     return stock_data, pivot_close, source
 
 
-def build_pivot_from_stock(stock_data: dict, tickers: List[str]) -> Optional[pd.DataFrame]:
-    frames = {}
-    for t in tickers:
-        df = stock_data.get(t)
-        if df is not None and "Close" in df:
-            frames[t] = df["Close"]
-    if not frames:
+def build_pivot_from_stock(wide: pd.DataFrame, tickers: List[str]) -> Optional[pd.DataFrame]:
+    """Close-only pivot (one column per ticker) sliced from the shared `to_wide` frame."""
+    cols = [(t, "Close") for t in tickers if (t, "Close") in wide]
+    if not cols:
         return None
-    return pd.concat(frames, axis=1)
+    return wide[cols].droplevel(1, axis=1).dropna(how="all")
 
 
-def load_macro():
-    macro_df = fetch_macro()
+def load_macro(macro_df: Optional[pd.DataFrame]):
     if macro_df is None or macro_df.empty:
         return None
     macro_df["date"] = pd.to_datetime(macro_df["date"])
@@ -809,11 +891,16 @@ def main():
         st.rerun()
 
     with st.spinner("正在读取数据..."):
-        stock_data, pivot_close, source = load_market_data(time_range)
-        macro_df = load_macro()
-        rs_df, rs_signal = analyze_smh_qqq_rs(stock_data)
+        market_df, macro_df = fetch_all(ALL_TICKERS, start=_daterange_start(time_range).isoformat())
+        stock_data, pivot_close, source = load_market_data(time_range, market_df)
+        macro_df = load_macro(macro_df)
+        # One aligned (ticker, field) frame, shared by the RS analysis and the L1 pivot
+        wide = to_wide(stock_data)
+        rs_df, rs_signal = analyze_smh_qqq_rs(wide)
 
     st.sidebar.caption(f"📊 数据源: {source.upper()}")
+    cache_stats = get_cache_stats()
+    st.sidebar.caption(f"🗄 指标缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}")
 
     if not stock_data:
         st.error("无法获取数据（数据库缺失且 API 失败）。")
@@ -910,19 +997,18 @@ def main():
 
     # Asset Overview
     st.subheader("🏥 核心资产体检表 (Asset Overview)")
-    summary_data = []
-    for t in TARGET_ETFS:
-        df = stock_data.get(t)
-        if df is not None and not df.empty:
-            latest = df.iloc[-1]
-            summary_data.append({
-                "标的": t,
-                "现价": f"${latest['Close']:.2f}",
-                "RSI (14)": round(latest.get("RSI", float("nan")), 1) if "RSI" in latest else None,
-                "年线乖离率": f"{latest.get('Dist_MA200_Pct', float('nan')):.1%}" if "Dist_MA200_Pct" in latest else "N/A",
-                "信号": analyze_signal(latest)
-            })
-    summary_df = pd.DataFrame(summary_data)
+    lasts = pd.DataFrame(
+        {t: stock_data[t].iloc[-1] for t in TARGET_ETFS if stock_data.get(t) is not None and not stock_data[t].empty}
+    ).T.reindex(columns=["Close", "RSI", "Dist_MA200_Pct"]).astype(float)
+    rsi_arr = lasts["RSI"].to_numpy()
+    dist_arr = lasts["Dist_MA200_Pct"].to_numpy()
+    summary_df = pd.DataFrame({
+        "标的": lasts.index,
+        "现价": lasts["Close"].map("${:.2f}".format).to_numpy(),
+        "RSI (14)": lasts["RSI"].round(1).to_numpy(),
+        "年线乖离率": np.where(np.isnan(dist_arr), "N/A", lasts["Dist_MA200_Pct"].map("{:.1%}".format).to_numpy()),
+        "信号": analyze_signals(rsi_arr, dist_arr),
+    })
 
     missing_targets = [t for t in TARGET_ETFS if t not in stock_data or stock_data[t] is None or stock_data[t].empty]
     #region agent log
@@ -939,15 +1025,19 @@ def main():
     })
     #endregion
 
-    def highlight_rsi(val):
-        if pd.isna(val): return ''
-        if val < 30: return 'background-color: rgba(0,255,0,0.2); color: green'
-        if val > 70: return 'background-color: rgba(255,0,0,0.2); color: red'
-        return ''
-    styler = summary_df.style
-    if "RSI (14)" in summary_df.columns:
-        styler = styler.map(highlight_rsi, subset=["RSI (14)"])
-    st.dataframe(styler, width="stretch", hide_index=True)
+    if st.session_state.get("debug"):
+        # Arrow/Styler path kept for debugging (sortable, copyable cells)
+        def highlight_rsi(val):
+            if pd.isna(val): return ''
+            if val < 30: return 'background-color: rgba(0,255,0,0.2); color: green'
+            if val > 70: return 'background-color: rgba(255,0,0,0.2); color: red'
+            return ''
+        styler = summary_df.style
+        if "RSI (14)" in summary_df.columns:
+            styler = styler.map(highlight_rsi, subset=["RSI (14)"])
+        st.dataframe(styler, width="stretch", hide_index=True)
+    else:
+        st.markdown(render_summary_table(summary_df), unsafe_allow_html=True)
 
 
     st.divider()
@@ -1009,45 +1099,15 @@ def main():
             # Quick Stats Banner
             st.markdown(render_etf_stats(etf_df), unsafe_allow_html=True)
 
-            # Chart
-            fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.03,
-                                row_heights=[0.5,0.15,0.15,0.1],
-                                subplot_titles=("Price & MAs","RSI","MACD","Volume"))
-            fig.add_trace(go.Candlestick(x=etf_df.index, open=etf_df["Open"], high=etf_df["High"],
-                                            low=etf_df["Low"], close=etf_df["Close"], name="Price"), row=1,col=1)
-            fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["SMA_20"], name="MA20", line=dict(color="#f59e0b")), row=1,col=1)
-            fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["SMA_200"], name="MA200", line=dict(color="#3b82f6")), row=1,col=1)
-            if "BB_Upper" in etf_df and "BB_Lower" in etf_df:
-                fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["BB_Upper"], showlegend=False, line=dict(color="#94a3b8", dash="dot", width=0)), row=1,col=1)
-                fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["BB_Lower"], showlegend=False, line=dict(color="#94a3b8", dash="dot", width=0),
-                                            fill="tonexty", fillcolor="rgba(148, 163, 184, 0.1)"), row=1,col=1)
-            fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["RSI"], name="RSI", line=dict(color="#8b5cf6")), row=2,col=1)
-            fig.add_hline(y=70, line_dash="dash", line_color="#e11d48", row=2,col=1)
-            fig.add_hline(y=30, line_dash="dash", line_color="#10b981", row=2,col=1)
-            if "MACD_Hist" in etf_df.columns:
-                fig.add_trace(go.Bar(x=etf_df.index, y=etf_df["MACD_Hist"], name="MACD Hist",
-                                        marker_color=["#10b981" if v>=0 else "#e11d48" for v in etf_df["MACD_Hist"]]), row=3,col=1)
-            if "MACD" in etf_df.columns:
-                fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["MACD"], name="MACD", line=dict(color="#3b82f6")), row=3,col=1)
-            if "MACD_Signal" in etf_df.columns:
-                fig.add_trace(go.Scatter(x=etf_df.index, y=etf_df["MACD_Signal"], name="Signal", line=dict(color="#f59e0b")), row=3,col=1)
-            if "Volume" in etf_df.columns:
-                colors = ["#e11d48" if r.Open - r.Close >=0 else "#10b981" for _, r in etf_df.iterrows()]
-                fig.add_trace(go.Bar(x=etf_df.index, y=etf_df["Volume"], name="Volume", marker_color=colors), row=4,col=1)
-            
-            # Apply custom theme
-            fig.update_layout(
-                height=700,
-                template="plotly_white",
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)",
-                font=dict(family="Lato, sans-serif", color="#64748b"),
-                xaxis_rangeslider_visible=False,
-                legend=dict(orientation="h", y=1.02),
-                margin=dict(l=10, r=10, t=30, b=10),
-            )
-            fig.update_xaxes(gridcolor="#f1f5f9", linecolor="#e2e8f0")
-            fig.update_yaxes(gridcolor="#f1f5f9", linecolor="#e2e8f0")
+            # Chart: reuse this session's figure while the underlying data is unchanged
+            fig_cache = st.session_state.setdefault("_etf_fig_cache", {})
+            signature = (len(etf_df), etf_df.index[-1], etf_df["Close"].iat[-1])
+            cached = fig_cache.get((etf_ticker, time_range))
+            if cached is not None and cached[0] == signature:
+                fig = cached[1]
+            else:
+                fig = build_etf_figure(etf_df, time_range)
+                fig_cache[(etf_ticker, time_range)] = (signature, fig)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning(f"⚠️ {etf_ticker} 数据不可用")
@@ -1064,7 +1124,7 @@ def main():
     # Macro / L1
     with tab2:
         if pivot_close is None:
-            pivot_close = build_pivot_from_stock(stock_data, L1_TICKERS)
+            pivot_close = build_pivot_from_stock(wide, L1_TICKERS)
         if pivot_close is not None:
             pivot_close = pivot_close.sort_index()
 
@@ -1272,7 +1332,8 @@ def main():
                                     pass
                                 if bonds_crash_risk:
                                     details.append("风险因子：TLT 与 QQQ 正相关 + TLT 暴跌")
-                                ok = send_feishu_alert(title, "\n".join(details))
+                                # Blocking: only mark the transition as sent once the webhook confirmed it
+                                ok = send_feishu_alert(title, "\n".join(details), blocking=True)
                                 if ok:
                                     sent_keys.add(dedup_key)
                                     st.session_state["_feishu_sent_transition_keys"] = sent_keys
@@ -10,6 +10,8 @@ TARGET_ETFS = ["VOO", "QQQ", "QLD", "TQQQ", "SMH", "TLT"]
 MACRO_TICKERS = ["^VIX", "^TNX"]
 L1_TICKERS = ["VOO", "QQQ", "SOXX", "TLT", "SMH", "XLP", "XLY"]
 TIME_RANGES = ["1y", "2y", "5y"]
+# Everything the app/jobs fetch; a tuple so st.cache_data hashes one immutable key
+ALL_TICKERS = tuple(sorted(set(TARGET_ETFS + MACRO_TICKERS + L1_TICKERS)))
 
 ETF_INFO = {
     "VOO": {
@@ -61,3 +63,7 @@ INDICATOR_INFO = {
 # Networking defaults
 YAHOO_USER_AGENT = "Mozilla/5.0"
 REQUEST_TIMEOUT = 15
+YAHOO_CONCURRENCY = 5  # max in-flight Yahoo chart requests
+YAHOO_MAX_RETRY_AFTER = 5  # cap (seconds) on honoring a 429 Retry-After before the crumb retry
+HTTP_CACHE_TTL = 600  # seconds a cached GET (F&G endpoints) is served locally, if requests-cache is installed
+FNG_TIMEOUT = (2, 4)  # (connect, read); F&G has several fallbacks so fail fast
@@ -1,10 +1,26 @@
+import asyncio
 import os
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 
 import pandas as pd
 import streamlit as st
 from supabase import create_client, Client
 
+MARKET_COLUMNS = ("date", "ticker", "close", "rsi_14", "ma200_dist_pct")
+MACRO_COLUMNS = ("date", "vix_close", "fear_greed_index", "us10y_yield", "soxx_qqq_ratio", "xlp_xly_ratio")
+
+PAGE_SIZE = 1000
+UPSERT_CHUNK_SIZE = 500
+UPSERT_WORKERS = 4
+
+
+@lru_cache(maxsize=4)
+def _get_client(url: str, key: str) -> Client:
+    """One Client (and its pooled HTTP session) per credential pair, shared process-wide."""
+    return create_client(url, key)
+
 
 def init_supabase() -> Optional[Client]:
     """Initialize Supabase client from Streamlit secrets or Environment variables."""
@@ -20,77 +36,145 @@ def init_supabase() -> Optional[Client]:
     if not url or not key:
         return None
         
-    return create_client(url, key)
+    return _get_client(url, key)
+
+def _to_typed_frame(records: List[dict], columns: Sequence[str]) -> pd.DataFrame:
+    """Build a compact frame from PostgREST rows: datetime dates, categorical tickers, float32 numerics."""
+    df = pd.DataFrame.from_records(records, columns=columns)
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"])
+    if "ticker" in df:
+        df["ticker"] = df["ticker"].astype("category")
+    for col in columns:
+        if col not in ("date", "ticker"):
+            df[col] = pd.to_numeric(df[col], errors="coerce", downcast="float")
+    return df
+
+def _fetch_paged(build_query, columns: Sequence[str], limit: Optional[int] = None) -> pd.DataFrame:
+    """Page through a PostgREST query PAGE_SIZE rows at a time, typing each page before concatenating."""
+    pages = []
+    fetched = 0
+    offset = 0
+    while True:
+        response = build_query().range(offset, offset + PAGE_SIZE - 1).execute()
+        if not response.data:
+            break
+        pages.append(_to_typed_frame(response.data, columns))
+        fetched += len(response.data)
+        if len(response.data) < PAGE_SIZE or (limit is not None and fetched >= limit):
+            break
+        offset += PAGE_SIZE
+
+    if not pages:
+        return pd.DataFrame()
+    df = pd.concat(pages, ignore_index=True)
+    if "ticker" in df:
+        # Per-page categoricals with different categories come back as object
+        df["ticker"] = df["ticker"].astype("category")
+    return df
 
-def fetch_market_daily(tickers: List[str], start: Optional[str] = None, limit: int = 10000) -> pd.DataFrame:
-    """Fetch market metrics for given tickers with pagination support."""
+def fetch_market_daily(tickers: List[str], start: Optional[str] = None, limit: int = 10000,
+                       columns: Sequence[str] = MARKET_COLUMNS) -> pd.DataFrame:
+    """Fetch market metrics for given tickers with pagination support; only `columns` go over the wire."""
     supabase = init_supabase()
     if not supabase:
         return pd.DataFrame()
+
+    def build_query():
+        query = supabase.table("market_daily_metrics").select(",".join(columns)).in_("ticker", tickers)
+        if start:
+            query = query.gte("date", start)
+        return query.order("date", desc=False)
+
     try:
-        all_data = []
-        offset = 0
-        batch_size = 1000
-        
-        while True:
-            query = supabase.table("market_daily_metrics").select("*").in_("ticker", tickers)
-            if start:
-                query = query.gte("date", start)
-            query = query.order("date", desc=False).range(offset, offset + batch_size - 1)
-            response = query.execute()
-            
-            if not response.data:
-                break
-            all_data.extend(response.data)
-            
-            if len(response.data) < batch_size or len(all_data) >= limit:
-                break
-            offset += batch_size
-        
-        if not all_data:
-            return pd.DataFrame()
-        return pd.DataFrame(all_data)
+        return _fetch_paged(build_query, columns, limit)
     except Exception as e:
         print(f"⚠️ DB fetch market_daily_metrics failed, fallback to API: {e}")
         return pd.DataFrame()
 
-def fetch_macro(start: Optional[str] = None) -> pd.DataFrame:
-    """Fetch macro indicators."""
+def fetch_macro(start: Optional[str] = None, columns: Sequence[str] = MACRO_COLUMNS) -> pd.DataFrame:
+    """Fetch macro indicators with pagination support; only `columns` go over the wire."""
     supabase = init_supabase()
     if not supabase:
         return pd.DataFrame()
-    try:
-        query = supabase.table("macro_indicators").select("*")
+
+    def build_query():
+        query = supabase.table("macro_indicators").select(",".join(columns))
         if start:
             query = query.gte("date", start)
-        response = query.order("date", desc=False).execute()
-        if not response.data:
-            return pd.DataFrame()
-        return pd.DataFrame(response.data)
+        return query.order("date", desc=False)
+
+    try:
+        return _fetch_paged(build_query, columns)
     except Exception as e:
         print(f"⚠️ DB fetch macro_indicators failed, fallback to API: {e}")
         return pd.DataFrame()
 
-def upsert_market_daily(data: List[dict]):
-    """Insert or update market daily metrics."""
+def fetch_all(tickers: List[str], start: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Fetch market metrics and macro indicators concurrently; returns (market_df, macro_df)."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        market_future = executor.submit(fetch_market_daily, tickers, start)
+        macro_future = executor.submit(fetch_macro, start)
+        return market_future.result(), macro_future.result()
+
+async def fetch_all_async(tickers: List[str], start: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """asyncio variant of `fetch_all` for callers already inside an event loop."""
+    market_df, macro_df = await asyncio.gather(
+        asyncio.to_thread(fetch_market_daily, tickers, start),
+        asyncio.to_thread(fetch_macro, start),
+    )
+    return market_df, macro_df
+
+def _upsert_chunked(table: str, data: List[dict]):
+    """Upsert in UPSERT_CHUNK_SIZE slices on a small thread pool; a failed chunk doesn't sink the rest."""
     supabase = init_supabase()
-    if not supabase:
+    if not supabase or not data:
         return
-        
-    try:
-        supabase.table("market_daily_metrics").upsert(data).execute()
-        print(f"✅ Upserted {len(data)} rows to market_daily_metrics")
-    except Exception as e:
-        print(f"❌ Error upserting market data: {e}")
+
+    chunks = [data[i:i + UPSERT_CHUNK_SIZE] for i in range(0, len(data), UPSERT_CHUNK_SIZE)]
+
+    def _upsert(batch: List[dict]) -> int:
+        supabase.table(table).upsert(batch).execute()
+        return len(batch)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=min(UPSERT_WORKERS, len(chunks))) as executor:
+        futures = {executor.submit(_upsert, batch): i for i, batch in enumerate(chunks)}
+        for future in as_completed(futures):
+            try:
+                written += future.result()
+            except Exception as e:
+                print(f"❌ Error upserting {table} chunk {futures[future] + 1}/{len(chunks)}: {e}")
+    if written:
+        print(f"✅ Upserted {written} rows to {table}")
+
+def upsert_market_daily(data: List[dict]):
+    """Insert or update market daily metrics."""
+    _upsert_chunked("market_daily_metrics", data)
 
 def upsert_macro(data: List[dict]):
     """Insert or update macro indicators."""
+    _upsert_chunked("macro_indicators", data)
+
+def _bulk_upsert(function: str, data: List[dict]) -> bool:
+    """Call a set-based bulk-upsert RPC from schema.sql; False if it failed or isn't installed."""
     supabase = init_supabase()
-    if not supabase:
-        return
-        
+    if not supabase or not data:
+        return False
     try:
-        supabase.table("macro_indicators").upsert(data).execute()
-        print(f"✅ Upserted {len(data)} rows to macro_indicators")
+        supabase.rpc(function, {"payload": data}).execute()
+        print(f"✅ Bulk upserted {len(data)} rows via {function}")
+        return True
     except Exception as e:
-        print(f"❌ Error upserting macro data: {e}")
+        print(f"⚠️ {function} failed, fallback to chunked upsert: {e}")
+        return False
+
+def bulk_upsert_market_daily(data: List[dict]):
+    """Backfill path: one server-side INSERT ... ON CONFLICT per call, falling back to chunked upserts."""
+    if not _bulk_upsert("bulk_upsert_market_daily", data):
+        upsert_market_daily(data)
+
+def bulk_upsert_macro(data: List[dict]):
+    """Backfill path: one server-side INSERT ... ON CONFLICT per call, falling back to chunked upserts."""
+    if not _bulk_upsert("bulk_upsert_macro", data):
+        upsert_macro(data)
@@ -9,30 +9,59 @@ Environment variables:
 Design:
 - Never raise to crash the Streamlit app.
 - Small timeout to avoid blocking UI.
+- One pooled session, so alert bursts reuse the TLS connection.
+- Fire-and-forget by default: the POST runs on a background thread.
 """
 
 from __future__ import annotations
 
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=Retry(total=1, backoff_factor=0.2)),
+)
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="feishu")
 
 
 def get_feishu_webhook() -> Optional[str]:
     return os.getenv("FEISHU_WEBHOOK")
 
 
+def _post_alert(url: str, payload: dict, timeout: float) -> bool:
+    try:
+        resp = _SESSION.post(url, json=payload, timeout=timeout)
+        return 200 <= resp.status_code < 300
+    except Exception:
+        return False
+
+
+def _log_failure(future: Future) -> None:
+    if not future.result():
+        print("⚠️ Feishu alert failed to send")
+
+
 def send_feishu_alert(
     title: str,
     content: str,
     *,
     webhook: Optional[str] = None,
     timeout: float = 6.0,
+    blocking: bool = False,
 ) -> bool:
     """Send a Feishu bot message.
 
-    Returns True if request was sent successfully (2xx), else False.
+    By default the request is queued on a background thread and True is
+    returned as soon as it is submitted. With ``blocking=True`` returns True
+    only if the request was sent successfully (2xx), else False.
+    Always False when no webhook is configured.
     """
 
     url = webhook or get_feishu_webhook()
@@ -44,8 +73,8 @@ def send_feishu_alert(
         "content": {"text": f"【AlphaPilot 监控报警】\n{title}\n\n{content}"},
     }
 
-    try:
-        resp = requests.post(url, json=payload, timeout=timeout)
-        return 200 <= resp.status_code < 300
-    except Exception:
-        return False
+    if blocking:
+        return _post_alert(url, payload, timeout)
+
+    _EXECUTOR.submit(_post_alert, url, payload, timeout).add_done_callback(_log_failure)
+    return True
@@ -4,11 +4,16 @@ ETF 溢价率计算器
 使用 yfinance 获取纳指期货和汇率数据
 """
 import datetime as dt
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 try:
     import akshare as ak
@@ -44,6 +49,19 @@ ETF_CONFIG = {
     "161128": {"name": "标普信息科技LOF", "index": "S&P-INFO-TECH", "fund_type": "lof"},
 }
 
+# yfinance 备选符号（按优先级）
+FUTURE_SYMBOLS = ["NQ=F", "^IXIC", "^NDX"]
+FOREX_SYMBOLS = ["USDCNY=X", "CNY=X"]
+
+# 代码 -> 基金类型，导入时预计算一次（未配置的代码按 etf 处理）
+_FUND_TYPE = {code: cfg.get("fund_type", "etf") for code, cfg in ETF_CONFIG.items()}
+
+# 净值磁盘缓存目录（按交易日分文件，跨进程/重启复用）
+NAV_CACHE_DIR = Path.home() / ".alphapilot_cache" / "nav"
+
+# 并发获取净值的线程数（calc_premium 另加 2 个线程给市场环境和实时价格）
+NAV_WORKERS = 8
+
 
 @dataclass
 class ETFPremiumData:
@@ -68,6 +86,34 @@ class MarketContext:
     future_error: Optional[str] = None
 
 
+@st.cache_data(ttl=60)  # 同一刷新窗口内所有代码共用一次快照请求
+def _spot_etf() -> Optional[pd.DataFrame]:
+    """东方财富 ETF 实时行情快照（带缓存）"""
+    return ak.fund_etf_spot_em()
+
+
+@st.cache_data(ttl=60)
+def _spot_lof() -> Optional[pd.DataFrame]:
+    """东方财富 LOF 实时行情快照（带缓存）"""
+    return ak.fund_lof_spot_em()
+
+
+def _lookup_spot_prices(df: pd.DataFrame, codes: List[str]) -> Dict[str, Optional[float]]:
+    """
+    从东方财富行情快照中批量取最新价（按代码建一次索引，避免逐个代码全表扫描）
+    Returns:
+        {code: price}，仅包含快照中存在的代码
+    """
+    code_col = "代码" if "代码" in df.columns else "基金代码"
+    price_col = "最新价" if "最新价" in df.columns else "现价"
+    
+    prices = pd.to_numeric(
+        df.drop_duplicates(subset=code_col).set_index(code_col)[price_col], errors="coerce"
+    )
+    present = prices.index.intersection(codes)
+    return {code: (float(price) if pd.notna(price) else None) for code, price in prices.loc[present].items()}
+
+
 def get_etf_realtime_price(etf_codes: List[str]) -> Dict[str, Optional[float]]:
     """
     使用 akshare 获取 ETF/LOF 实时价格
@@ -82,68 +128,147 @@ def get_etf_realtime_price(etf_codes: List[str]) -> Dict[str, Optional[float]]:
     result = {code: None for code in etf_codes}
     
     # 分离 ETF 和 LOF 代码
-    etf_list = [c for c in etf_codes if ETF_CONFIG.get(c, {}).get("fund_type", "etf") == "etf"]
-    lof_list = [c for c in etf_codes if ETF_CONFIG.get(c, {}).get("fund_type") == "lof"]
+    etf_list = [c for c in etf_codes if _FUND_TYPE.get(c, "etf") == "etf"]
+    lof_list = [c for c in etf_codes if _FUND_TYPE.get(c) == "lof"]
     
     # 获取 ETF 实时行情
     if etf_list:
         try:
-            df = ak.fund_etf_spot_em()
+            df = _spot_etf()
             if df is not None and not df.empty:
-                code_col = "代码" if "代码" in df.columns else "基金代码"
-                price_col = "最新价" if "最新价" in df.columns else "现价"
-                
-                for code in etf_list:
-                    row = df[df[code_col] == code]
-                    if not row.empty:
-                        price = row.iloc[0][price_col]
-                        result[code] = float(price) if pd.notna(price) else None
+                result.update(_lookup_spot_prices(df, etf_list))
         except Exception as e:
             st.warning(f"获取 ETF 实时价格失败: {e}")
     
     # 获取 LOF 实时行情
     if lof_list:
         try:
-            df = ak.fund_lof_spot_em()
+            df = _spot_lof()
             if df is not None and not df.empty:
-                code_col = "代码" if "代码" in df.columns else "基金代码"
-                price_col = "最新价" if "最新价" in df.columns else "现价"
-                
-                for code in lof_list:
-                    row = df[df[code_col] == code]
-                    if not row.empty:
-                        price = row.iloc[0][price_col]
-                        result[code] = float(price) if pd.notna(price) else None
+                result.update(_lookup_spot_prices(df, lof_list))
         except Exception as e:
             st.warning(f"获取 LOF 实时价格失败: {e}")
     
     return result
 
 
-def get_etf_nav(etf_code: str) -> Optional[float]:
+def _nav_cache_path(etf_code: str) -> Path:
+    """某代码的净值缓存文件路径（每个代码一个文件，按日覆盖写，目录不会无限增长）"""
+    return NAV_CACHE_DIR / f"{etf_code}.parquet"
+
+
+def _read_nav_cache(path: Path, day: dt.date) -> Optional[float]:
+    """缓存是当日写入的才有效"""
+    try:
+        cached = pd.read_parquet(path)
+        if cached["day"].iloc[-1] == f"{day:%Y%m%d}":
+            return float(cached["nav"].iloc[-1])
+    except Exception:
+        pass
+    return None
+
+
+def _write_nav_cache(path: Path, day: dt.date, nav: float) -> None:
+    # 缓存写失败不影响主流程
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame({"day": [f"{day:%Y%m%d}"], "nav": [nav]}).to_parquet(path)
+        # 清理旧版按日期命名的缓存文件
+        for old in path.parent.glob(f"{path.stem}_*.parquet"):
+            old.unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+@st.cache_data(ttl=3600)  # 进程内快速路径；净值每日更新一次，跨进程由磁盘缓存兜底
+def _fetch_etf_nav(etf_code: str) -> Optional[float]:
     """
-    使用 akshare 获取 ETF 最新净值
+    只缓存成功结果：获取失败时抛异常（st.cache_data 不缓存异常），由 get_etf_nav 处理
     Args:
         etf_code: ETF 代码
     Returns:
-        最新单位净值
+        最新单位净值；未安装 akshare 时返回 None
     """
+    today = dt.date.today()
+    cache_path = _nav_cache_path(etf_code)
+    nav = _read_nav_cache(cache_path, today) if cache_path.exists() else None
+    if nav is not None:
+        return nav
+
     if ak is None:
         return None
-    
+
+    # 获取开放式基金净值
+    df = ak.fund_open_fund_info_em(symbol=etf_code, indicator="单位净值走势")
+    if df is None or df.empty:
+        raise LookupError(f"{etf_code} 无净值数据")
+    # 取最新的净值
+    latest = df.iloc[-1]
+    # 列名通常是 "单位净值" 或类似
+    nav_col = "单位净值" if "单位净值" in df.columns else df.columns[1]
+    nav = float(latest[nav_col])
+    _write_nav_cache(cache_path, today, nav)
+    return nav
+
+
+def get_etf_nav(etf_code: str) -> Optional[float]:
+    """
+    使用 akshare 获取 ETF 最新净值（当日结果缓存到磁盘）；失败不缓存，下次调用会重试
+    Args:
+        etf_code: ETF 代码
+    Returns:
+        最新单位净值
+    """
     try:
-        # 获取开放式基金净值
-        df = ak.fund_open_fund_info_em(symbol=etf_code, indicator="单位净值走势")
-        if df is not None and not df.empty:
-            # 取最新的净值
-            latest = df.iloc[-1]
-            # 列名通常是 "单位净值" 或类似
-            nav_col = "单位净值" if "单位净值" in df.columns else df.columns[1]
-            return float(latest[nav_col])
+        return _fetch_etf_nav(etf_code)
+    except LookupError:
+        return None
     except Exception as e:
         st.warning(f"获取 {etf_code} 净值失败: {e}")
-    
-    return None
+        return None
+
+
+def _streamlit_executor(max_workers: int) -> ThreadPoolExecutor:
+    """线程池：工作线程继承当前 Streamlit 会话上下文，保证 st.warning / st.cache_data 正常工作"""
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=add_script_run_ctx, initargs=(None, ctx))
+
+
+@st.cache_data(ttl=60)
+def _batch_quotes() -> Dict[str, pd.Series]:
+    """
+    一次 yf.download 批量拉取期货/指数/汇率近5日收盘价（带缓存，期货和汇率共用）
+    Returns:
+        {symbol: 收盘价序列}，仅包含有数据的符号
+    """
+    data = yf.download(
+        FUTURE_SYMBOLS + FOREX_SYMBOLS,
+        period="5d",
+        interval="1d",
+        group_by="ticker",
+        threads=True,
+        progress=False,
+    )
+    quotes = {}
+    if data is None or data.empty:
+        return quotes
+    
+    for symbol in data.columns.get_level_values(0).unique():
+        # 各符号交易日不同，批量结果按日期并集对齐，需逐个去掉空值
+        close = data[symbol]["Close"].dropna()
+        if not close.empty:
+            quotes[symbol] = close
+    return quotes
+
+
+def _get_batch_quotes(errors: List[str]) -> Dict[str, pd.Series]:
+    """获取批量行情，失败时记录错误并返回空字典"""
+    try:
+        return _batch_quotes()
+    except Exception as e:
+        errors.append(f"yfinance批量: {str(e)[:30]}")
+        return {}
+
 
 def get_nasdaq_future_change() -> Tuple[Optional[float], Optional[float], Optional[str]]:
     """
@@ -160,27 +285,22 @@ def get_nasdaq_future_change() -> Tuple[Optional[float], Optional[float], Option
             # 使用新浪纳斯达克指数数据
             df = ak.index_us_stock_sina(symbol=".IXIC")
             if df is not None and not df.empty and len(df) >= 2:
-                curr_close = float(df.iloc[-1]["close"])
-                prev_close = float(df.iloc[-2]["close"])
+                prev_close, curr_close = df["close"].tail(2).to_numpy(dtype=float)
                 change_pct = ((curr_close - prev_close) / prev_close) * 100
-                return change_pct, curr_close, None
+                return float(change_pct), float(curr_close), None
         except Exception as e:
             errors.append(f"akshare纳指: {str(e)[:50]}")
     
-    # 方法2: 尝试 yfinance（多个符号）
+    # 方法2: 尝试 yfinance（多个符号，共用一次批量下载）
     if yf is not None:
-        for symbol in ["NQ=F", "^IXIC", "^NDX"]:
-            try:
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period="5d", interval="1d")
-                if hist is not None and not hist.empty and len(hist) >= 2:
-                    prev_close = hist["Close"].iloc[-2]
-                    curr_close = hist["Close"].iloc[-1]
-                    if not pd.isna(curr_close) and not pd.isna(prev_close) and prev_close > 0:
-                        change_pct = ((curr_close - prev_close) / prev_close) * 100
-                        return change_pct, curr_close, None
-            except Exception as e:
-                errors.append(f"yfinance({symbol}): {str(e)[:30]}")
+        quotes = _get_batch_quotes(errors)
+        for symbol in FUTURE_SYMBOLS:
+            close = quotes.get(symbol)
+            if close is not None and len(close) >= 2:
+                prev_close, curr_close = close.to_numpy(dtype=float)[-2:]
+                if prev_close > 0:
+                    change_pct = ((curr_close - prev_close) / prev_close) * 100
+                    return float(change_pct), float(curr_close), None
     
     error_msg = "; ".join(errors) if errors else "无法获取期货/指数数据"
     return None, None, error_msg
@@ -202,10 +322,9 @@ def get_forex_usd_cny() -> Tuple[Optional[float], Optional[float], Optional[str]
             if df is not None and not df.empty and "美元" in df.columns:
                 # 获取最近两天数据
                 if len(df) >= 2:
-                    curr_rate = float(df.iloc[-1]["美元"]) / 100  # 转换单位
-                    prev_rate = float(df.iloc[-2]["美元"]) / 100
+                    prev_rate, curr_rate = df["美元"].tail(2).to_numpy(dtype=float) / 100  # 转换单位
                     change_pct = ((curr_rate - prev_rate) / prev_rate) * 100
-                    return curr_rate, change_pct, None
+                    return float(curr_rate), float(change_pct), None
                 elif len(df) >= 1:
                     curr_rate = float(df.iloc[-1]["美元"]) / 100
                     return curr_rate, 0.0, None
@@ -227,23 +346,20 @@ def get_forex_usd_cny() -> Tuple[Optional[float], Optional[float], Optional[str]
         except Exception as e:
             errors.append(f"akshare外汇: {str(e)[:50]}")
     
-    # 方法2: 尝试 yfinance（使用不同的符号）
+    # 方法2: 尝试 yfinance（使用不同的符号，共用一次批量下载）
     if yf is not None:
-        for symbol in ["USDCNY=X", "CNY=X"]:
-            try:
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period="5d", interval="1d")
-                if hist is not None and not hist.empty and len(hist) >= 1:
-                    rate = hist["Close"].iloc[-1]
-                    if not pd.isna(rate) and rate > 0:
-                        if len(hist) >= 2:
-                            prev = hist["Close"].iloc[-2]
-                            change_pct = ((rate - prev) / prev) * 100
-                        else:
-                            change_pct = 0.0
-                        return rate, change_pct, None
-            except Exception as e:
-                errors.append(f"yfinance({symbol}): {str(e)[:30]}")
+        quotes = _get_batch_quotes(errors)
+        for symbol in FOREX_SYMBOLS:
+            close = quotes.get(symbol)
+            if close is not None and len(close) >= 1:
+                closes = close.to_numpy(dtype=float)[-2:]
+                rate = closes[-1]
+                if rate > 0:
+                    if len(closes) == 2:
+                        change_pct = ((rate - closes[0]) / closes[0]) * 100
+                    else:
+                        change_pct = 0.0
+                    return float(rate), float(change_pct), None
     
     # 方法3: 使用固定汇率作为后备（显示警告）
     fallback_rate = 7.25
@@ -292,55 +408,64 @@ def calc_premium(etf_codes: Optional[List[str]] = None) -> Tuple[List[ETFPremium
     if etf_codes is None:
         etf_codes = list(ETF_CONFIG.keys())
     
-    # 1. 获取市场环境数据
-    context = get_market_context()
-    
-    # 2. 获取 ETF 实时价格
-    prices = get_etf_realtime_price(etf_codes)
-    
-    # 3. 计算每个 ETF 的溢价率
-    results = []
-    
-    for code in etf_codes:
-        config = ETF_CONFIG.get(code, {"name": code, "index": "Unknown"})
+    # 市场环境和实时价格先并发发出；期货数据缺失时所有估值都无法计算，净值请求直接跳过
+    with _streamlit_executor(NAV_WORKERS + 2) as executor:
+        ctx_future = executor.submit(get_market_context)
+        price_future = executor.submit(get_etf_realtime_price, etf_codes)
         
-        # 获取当前价格
-        current_price = prices.get(code)
+        # 1. 市场环境数据
+        context = ctx_future.result()
+        no_future = context.future_change_pct is None
         
-        # 获取昨日净值
-        nav = get_etf_nav(code)
+        # 2. 各 ETF 昨日净值（与实时价格并发）
+        nav_futures = {} if no_future else {code: executor.submit(get_etf_nav, code) for code in etf_codes}
         
-        # 计算估值和溢价率
-        estimated_nav = None
-        premium_rate = None
-        error = None
-        
-        if current_price is None:
-            error = "无法获取实时价格"
-        elif nav is None:
-            error = "无法获取净值"
-        elif context.future_change_pct is None:
-            error = "无法获取期货数据"
-        else:
-            # 核心计算
-            future_factor = 1 + (context.future_change_pct / 100)
-            forex_factor = 1 + ((context.forex_change_pct or 0) / 100)
-            estimated_nav = nav * future_factor * forex_factor
-            premium_rate = (current_price - estimated_nav) / estimated_nav
+        # 3. ETF 实时价格
+        prices = price_future.result()
         
+        # 4. 等待各 ETF 昨日净值
+        navs = [nav_futures[code].result() for code in etf_codes] if nav_futures else [None] * len(etf_codes)
+    
+    # 5. 向量化计算估值和溢价率（None -> NaN）
+    price_arr = np.array([prices.get(code) for code in etf_codes], dtype=float)
+    nav_arr = np.array(navs, dtype=float)
+    
+    if no_future:
+        estimated_arr = np.full(len(etf_codes), np.nan)
+        errors = np.where(np.isnan(price_arr), "无法获取实时价格", "无法获取期货数据")
+    else:
+        future_factor = 1 + (context.future_change_pct / 100)
+        forex_factor = 1 + ((context.forex_change_pct or 0) / 100)
+        estimated_arr = nav_arr * future_factor * forex_factor
+        errors = np.select(
+            [np.isnan(price_arr), np.isnan(nav_arr)],
+            ["无法获取实时价格", "无法获取净值"],
+            default="",
+        )
+    premium_arr = (price_arr - estimated_arr) / estimated_arr
+    
+    results = []
+    for code, nav, estimated_nav, premium_rate, error in zip(etf_codes, navs, estimated_arr, premium_arr, errors):
+        config = ETF_CONFIG.get(code, {"name": code, "index": "Unknown"})
         results.append(ETFPremiumData(
             code=code,
             name=config["name"],
-            current_price=current_price,
+            current_price=prices.get(code),
             yesterday_nav=nav,
-            estimated_nav=estimated_nav,
-            premium_rate=premium_rate,
-            error=error,
+            estimated_nav=None if error else float(estimated_nav),
+            premium_rate=None if error else float(premium_rate),
+            error=str(error) or None,
         ))
     
     return results, context
 
 
+@st.cache_data(ttl=60)
+def _cached_calc_premium(codes_key: Tuple[str, ...], minute_bucket: int) -> Tuple[List[ETFPremiumData], MarketContext]:
+    """按 (代码集合, 分钟) 缓存计算结果，排序等纯界面交互的重跑不再发起网络请求"""
+    return calc_premium(list(codes_key))
+
+
 def get_action_recommendation(premium_rate: Optional[float]) -> Tuple[str, str]:
     """
     根据溢价率给出操作建议
@@ -434,7 +559,7 @@ def render_premium_dashboard():
     
     # 获取数据
     with st.spinner("正在获取实时数据..."):
-        results, context = calc_premium()
+        results, context = _cached_calc_premium(tuple(ETF_CONFIG), int(time.time() // 60))
     
     # 市场环境卡片
     st.markdown("### 📈 市场环境")
@@ -480,70 +605,65 @@ def render_premium_dashboard():
     else:
         results_sorted = results
     
-    # 构建表格数据
-    table_data = []
+    # 构建表格数据：单次遍历按列收集，最后一次性构建 DataFrame
+    codes, names, prices_str, navs_str, est_str, prem_str, prem_val, action_str = ([] for _ in range(8))
     for data in results_sorted:
+        codes.append(data.code)
+        names.append(data.name)
         if data.error:
-            row = {
-                "ETF代码": data.code,
-                "名称": data.name,
-                "现价": "N/A",
-                "昨日净值": "N/A",
-                "估算净值": "N/A",
-                "实时溢价率": "N/A",
-                "溢价率值": float('inf'),  # 用于内部排序
-                "建议操作": f"⚠️ {data.error}",
-            }
+            prices_str.append("N/A")
+            navs_str.append("N/A")
+            est_str.append("N/A")
+            prem_str.append("N/A")
+            prem_val.append(float('inf'))  # 用于内部排序
+            action_str.append(f"⚠️ {data.error}")
         else:
             premium_pct = data.premium_rate * 100 if data.premium_rate else 0
             action, emoji = get_action_recommendation(data.premium_rate)
-            
-            row = {
-                "ETF代码": data.code,
-                "名称": data.name,
-                "现价": f"{data.current_price:.3f}",
-                "昨日净值": f"{data.yesterday_nav:.4f}" if data.yesterday_nav else "N/A",
-                "估算净值": f"{data.estimated_nav:.4f}" if data.estimated_nav else "N/A",
-                "实时溢价率": f"{premium_pct:+.2f}%",
-                "溢价率值": premium_pct,  # 用于内部排序
-                "建议操作": f"{emoji} {action}",
-            }
-        table_data.append(row)
-    
-    df = pd.DataFrame(table_data)
-    
-    # 创建用于显示的副本，保留数值列供排序
-    # 重命名溢价率值列为"溢价率排序"，并放在实时溢价率后面
-    df_display = df.copy()
-    df_display = df_display.rename(columns={"溢价率值": "溢价率(数值)"})
-    
-    # 重新排列列顺序，把数值列放在显示列后面
-    column_order = ["ETF代码", "名称", "现价", "昨日净值", "估算净值", "溢价率(数值)", "实时溢价率", "建议操作"]
-    df_display = df_display[column_order]
-    
-    # 样式函数 - Soft Editorial Theme
-    def highlight_premium(val):
-        if isinstance(val, str) and "%" in val:
-            try:
-                pct = float(val.replace("%", "").replace("+", ""))
-                if pct > 3:
-                    return "background-color: #fff1f2; color: #e11d48; font-weight: 600; border-radius: 12px; padding: 2px 8px" # Rose
-                elif pct < 0:
-                    return "background-color: #ecfdf5; color: #059669; font-weight: 600; border-radius: 12px; padding: 2px 8px" # Emerald
-            except ValueError:
-                pass
-        return ""
-    
-    def highlight_action(val):
-        if "🔴" in str(val):
-            return "background-color: #fff1f2; color: #e11d48; border-radius: 12px"
-        elif "🟢" in str(val):
-            return "background-color: #ecfdf5; color: #059669; border-radius: 12px"
-        elif "🟠" in str(val):
-            return "background-color: #fffbeb; color: #d97706; border-radius: 12px"
-        return ""
-    
-    styled_df = df_display.style.map(highlight_premium, subset=["实时溢价率"]).map(
+            prices_str.append(f"{data.current_price:.3f}")
+            navs_str.append(f"{data.yesterday_nav:.4f}" if data.yesterday_nav else "N/A")
+            est_str.append(f"{data.estimated_nav:.4f}" if data.estimated_nav else "N/A")
+            prem_str.append(f"{premium_pct:+.2f}%")
+            prem_val.append(premium_pct)
+            action_str.append(f"{emoji} {action}")
+    
+    # 数值列"溢价率(数值)"放在显示列前面，供排序使用
+    df_display = pd.DataFrame({
+        "ETF代码": codes,
+        "名称": names,
+        "现价": prices_str,
+        "昨日净值": navs_str,
+        "估算净值": est_str,
+        "溢价率(数值)": np.asarray(prem_val, dtype="float64"),
+        "实时溢价率": prem_str,
+        "建议操作": action_str,
+    })
+    
+    # 样式函数 - Soft Editorial Theme（整列向量化，直接基于数值列，无需逐格解析字符串）
+    def highlight_premium(col):
+        pct = col.to_numpy(dtype=float)
+        return np.select(
+            [np.isfinite(pct) & (pct > 3), pct < 0],
+            [
+                "background-color: #fff1f2; color: #e11d48; font-weight: 600; border-radius: 12px; padding: 2px 8px",  # Rose
+                "background-color: #ecfdf5; color: #059669; font-weight: 600; border-radius: 12px; padding: 2px 8px",  # Emerald
+            ],
+            default="",
+        )
+    
+    def highlight_action(col):
+        action = col.astype(str)
+        return np.select(
+            [action.str.contains("🔴"), action.str.contains("🟢"), action.str.contains("🟠")],
+            [
+                "background-color: #fff1f2; color: #e11d48; border-radius: 12px",
+                "background-color: #ecfdf5; color: #059669; border-radius: 12px",
+                "background-color: #fffbeb; color: #d97706; border-radius: 12px",
+            ],
+            default="",
+        )
+    
+    styled_df = df_display.style.apply(highlight_premium, subset=["溢价率(数值)"]).apply(
         highlight_action, subset=["建议操作"]
     )
     
@@ -27,3 +27,41 @@ CREATE TABLE IF NOT EXISTS macro_indicators (
 
 
 
+
+-- Set-based bulk upserts for the one-shot history backfill (scripts/backfill_history.py).
+-- Each RPC call is a single INSERT ... SELECT over the JSON payload instead of row-level upserts.
+CREATE OR REPLACE FUNCTION bulk_upsert_market_daily(payload JSONB)
+RETURNS INTEGER
+LANGUAGE SQL
+AS $$
+    WITH upserted AS (
+        INSERT INTO market_daily_metrics (date, ticker, close, rsi_14, ma200_dist_pct)
+        SELECT date, ticker, close, rsi_14, ma200_dist_pct
+        FROM jsonb_populate_recordset(NULL::market_daily_metrics, payload)
+        ON CONFLICT (date, ticker) DO UPDATE SET
+            close = EXCLUDED.close,
+            rsi_14 = EXCLUDED.rsi_14,
+            ma200_dist_pct = EXCLUDED.ma200_dist_pct
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM upserted;
+$$;
+
+CREATE OR REPLACE FUNCTION bulk_upsert_macro(payload JSONB)
+RETURNS INTEGER
+LANGUAGE SQL
+AS $$
+    WITH upserted AS (
+        INSERT INTO macro_indicators (date, vix_close, fear_greed_index, us10y_yield, soxx_qqq_ratio, xlp_xly_ratio)
+        SELECT date, vix_close, fear_greed_index, us10y_yield, soxx_qqq_ratio, xlp_xly_ratio
+        FROM jsonb_populate_recordset(NULL::macro_indicators, payload)
+        ON CONFLICT (date) DO UPDATE SET
+            vix_close = EXCLUDED.vix_close,
+            fear_greed_index = EXCLUDED.fear_greed_index,
+            us10y_yield = EXCLUDED.us10y_yield,
+            soxx_qqq_ratio = EXCLUDED.soxx_qqq_ratio,
+            xlp_xly_ratio = EXCLUDED.xlp_xly_ratio
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM upserted;
+$$;
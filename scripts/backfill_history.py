@@ -5,21 +5,86 @@
 
 import sys
 import os
+import json
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, timezone
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+try:
+    from joblib import Memory
+except ImportError:
+    Memory = None
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db_manager import init_supabase, upsert_market_daily, upsert_macro
-from config import TARGET_ETFS, MACRO_TICKERS, L1_TICKERS
+from db_manager import bulk_upsert_macro, bulk_upsert_market_daily, init_supabase
+from config import ALL_TICKERS
+
+# 并发下载的线程数
+FETCH_WORKERS = 8
+
+# 历史行情磁盘缓存（按 UTC 日期失效），同日重跑回填时跳过全部下载
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache_yahoo")
+_MEMORY = Memory(CACHE_DIR, verbose=0) if Memory is not None else None
+
+# 所有线程共用一个 keep-alive 会话，复用 TCP/TLS 连接；连接池覆盖全部并发线程，限流/5xx 自动退避重试
+_SESSION = requests.Session()
+_SESSION.headers["User-Agent"] = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+    ),
+)
 
-# 所有需要获取的 Tickers
-ALL_TICKERS = list(set(TARGET_ETFS + MACRO_TICKERS + L1_TICKERS))
 
-def fetch_yahoo_chart(ticker: str, period: str = "2y") -> pd.DataFrame:
+# Yahoo crumb 及其 cookies 持久化到磁盘，12 小时内的重复运行无需重新获取
+CRUMB_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".yahoo_crumb.json")
+CRUMB_TTL = 12 * 3600
+
+
+def get_yahoo_crumb() -> Optional[str]:
+    """读取磁盘上未过期的 crumb（并恢复 cookies），否则重新获取并写回磁盘；失败返回 None"""
+    try:
+        if time.time() - os.path.getmtime(CRUMB_FILE) < CRUMB_TTL:
+            with open(CRUMB_FILE, encoding="utf-8") as f:
+                cached = json.load(f)
+            _SESSION.cookies.update(cached.get("cookies", {}))
+            if cached.get("crumb"):
+                return cached["crumb"]
+    except (OSError, ValueError):
+        pass
+    
+    try:
+        response = _SESSION.get("https://query1.finance.yahoo.com/v1/test/getcrumb", timeout=10)
+        crumb = response.text.strip() if response.status_code == 200 else None
+    except Exception:
+        return None
+    if crumb:
+        try:
+            with open(CRUMB_FILE, "w", encoding="utf-8") as f:
+                json.dump({"crumb": crumb, "cookies": _SESSION.cookies.get_dict()}, f)
+        except OSError:
+            pass
+    return crumb
+
+
+def fetch_yahoo_chart(ticker: str, period: str = "2y", crumb: Optional[str] = None) -> pd.DataFrame:
     """通过 Yahoo Chart API 获取历史数据"""
     url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
     params = {
@@ -27,14 +92,13 @@ def fetch_yahoo_chart(ticker: str, period: str = "2y") -> pd.DataFrame:
         "interval": "1d",
         "includePrePost": "false",
     }
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
+    if crumb:
+        params["crumb"] = crumb
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=30)
+        response = _SESSION.get(url, params=params, timeout=30)
         if response.status_code != 200:
-            print(f"  ❌ HTTP {response.status_code}")
+            print(f"  ❌ {ticker} HTTP {response.status_code}")
             return pd.DataFrame()
         
         data = response.json()
@@ -43,28 +107,118 @@ def fetch_yahoo_chart(ticker: str, period: str = "2y") -> pd.DataFrame:
         timestamps = result["timestamp"]
         quote = result["indicators"]["quote"][0]
         
+        # 先在 numpy 数组上过滤掉无收盘价的行，再用较短的数组构建 DataFrame；
+        # 时间戳是盘中开盘时刻（如 14:30 UTC），归一到日期，与 yf.download 的零点索引对齐
+        close = np.array(quote["close"], dtype=float)
+        mask = ~np.isnan(close)
         df = pd.DataFrame({
-            "Open": quote["open"],
-            "High": quote["high"],
-            "Low": quote["low"],
-            "Close": quote["close"],
-            "Volume": quote["volume"],
-        }, index=pd.to_datetime(timestamps, unit="s"))
+            "Open": np.array(quote["open"], dtype=float)[mask],
+            "High": np.array(quote["high"], dtype=float)[mask],
+            "Low": np.array(quote["low"], dtype=float)[mask],
+            "Close": close[mask],
+            "Volume": np.array(quote["volume"], dtype=float)[mask],
+        }, index=pd.to_datetime(np.asarray(timestamps)[mask], unit="s").normalize())
         
         df.index.name = "Date"
-        return df.dropna(subset=["Close"])
+        return df
     
     except Exception as e:
-        print(f"  ❌ 错误: {e}")
+        print(f"  ❌ {ticker} 错误: {e}")
         return pd.DataFrame()
 
 
+def fetch_yahoo_charts(tickers: List[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+    """线程池并发获取多个 ticker 的历史数据（共用同一个 crumb）"""
+    crumb = get_yahoo_crumb()
+    results = {}
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = {executor.submit(fetch_yahoo_chart, t, period, crumb): t for t in tickers}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def _download_history(tickers: List[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+    """一次 yf.download 批量获取历史数据；批量结果缺失的 ticker 再走 Chart API 并发补齐"""
+    frames = {}
+    if yf is not None:
+        try:
+            data = yf.download(
+                tickers,
+                period=period,
+                interval="1d",
+                group_by="ticker",
+                auto_adjust=False,  # 与 Chart API 补齐及 App 实时路径一致：存未复权收盘价
+                progress=False,
+                threads=True,
+            )
+            if data is not None and not data.empty:
+                available = set(data.columns.get_level_values(0))
+                for t in tickers:
+                    if t in available:
+                        df = data[t].dropna(subset=["Close"])
+                        if not df.empty:
+                            frames[t] = df
+        except Exception as e:
+            print(f"  ⚠️ yfinance 批量下载失败: {e}")
+    
+    missing = [t for t in tickers if t not in frames]
+    if missing:
+        print(f"  ↪️ Chart API 补齐: {missing}")
+        frames.update(fetch_yahoo_charts(missing, period))
+    return frames
+
+
+def _download_history_for_day(tickers: Tuple[str, ...], period: str, utc_day: str) -> Dict[str, pd.DataFrame]:
+    """utc_day 只参与缓存键，使缓存按天失效"""
+    return _download_history(list(tickers), period)
+
+
+_download_history_cached = _MEMORY.cache(_download_history_for_day) if _MEMORY is not None else None
+
+
+def download_history(tickers: List[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+    """批量获取历史数据；同一 UTC 日内重跑直接读磁盘缓存，有 ticker 缺数据时不保留缓存"""
+    if _download_history_cached is None:
+        return _download_history(tickers, period)
+    
+    # 缓存键按天变化，清掉一天前的旧条目，避免 .cache_yahoo 无限增长
+    _MEMORY.reduce_size(age_limit=timedelta(days=1))
+    utc_day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    shelved = _download_history_cached.call_and_shelve(tuple(tickers), period, utc_day)
+    frames = shelved.get()
+    if any(frames.get(t, pd.DataFrame()).empty for t in tickers):
+        shelved.clear()
+    return frames
+
+
+def write_batches(upsert, records: List[dict], batch_size: int = 2000):
+    """分批写入数据库；两个批次在线程池中重叠提交，数据库响应本身即为背压"""
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    written = 0
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {executor.submit(upsert, batch): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            future.result()
+            written += futures[future]
+            print(f"   已写入 {written}/{len(records)}")
+    return written
+
+
+def frames_to_records(frames: List[pd.DataFrame]) -> List[dict]:
+    """拼接列式小表，统一 NaN -> None 并转换为数据库记录格式"""
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.astype(object).where(combined.notna(), None).to_dict("records")
+
+
 def calculate_rsi(df: pd.DataFrame, window: int = 14) -> pd.Series:
-    """计算 RSI"""
+    """计算 RSI（Wilder 平滑：alpha = 1/window 的指数平均）"""
     delta = df["Close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
+    gain = delta.clip(lower=0)
+    loss = (-delta).clip(lower=0)
+    avg_gain = gain.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    rs = avg_gain / avg_loss
     return 100 - (100 / (1 + rs))
 
 
@@ -74,7 +228,7 @@ def calculate_ma200_dist(df: pd.DataFrame) -> pd.Series:
     return (df["Close"] - ma200) / ma200
 
 
-def backfill_market_data(period: str = "2y", batch_size: int = 500):
+def backfill_market_data(period: str = "2y", batch_size: int = 2000):
     """回填市场数据"""
     print("=" * 60)
     print("📊 开始回填市场数据")
@@ -82,48 +236,35 @@ def backfill_market_data(period: str = "2y", batch_size: int = 500):
     print(f"   周期: {period}")
     print("=" * 60)
     
-    all_records = []
+    print(f"\n📡 批量获取 {len(ALL_TICKERS)} 个 ticker...")
+    charts = download_history(list(ALL_TICKERS), period)
     
+    # 行情已全部下载完毕，指标计算很快，直接组装列式小表后分批写入
+    print("\n💾 开始计算并写入数据库...")
+    frames = []
     for ticker in ALL_TICKERS:
-        print(f"\n📡 获取 {ticker}...")
-        df = fetch_yahoo_chart(ticker, period)
+        df = charts.get(ticker, pd.DataFrame())
         
         if df.empty:
             print(f"  ⚠️ {ticker} 无数据，跳过")
             continue
         
-        print(f"  ✅ 获取到 {len(df)} 条记录")
-        
-        # 计算指标
-        df["RSI_14"] = calculate_rsi(df)
-        df["MA200_Dist"] = calculate_ma200_dist(df)
+        print(f"  ✅ {ticker} 获取到 {len(df)} 条记录")
         
-        # 转换为数据库记录格式
-        for date, row in df.iterrows():
-            record = {
-                "date": date.strftime("%Y-%m-%d"),
-                "ticker": ticker,
-                "close": float(row["Close"]) if pd.notna(row["Close"]) else None,
-                "rsi_14": float(row["RSI_14"]) if pd.notna(row["RSI_14"]) else None,
-                "ma200_dist_pct": float(row["MA200_Dist"]) if pd.notna(row["MA200_Dist"]) else None,
-            }
-            all_records.append(record)
-        
-        # 避免请求过快
-        time.sleep(0.5)
-    
-    print(f"\n📝 总计 {len(all_records)} 条记录待写入")
+        # 计算指标，按数据库列组装成列式小表
+        frames.append(pd.DataFrame({
+            "date": df.index.strftime("%Y-%m-%d"),
+            "ticker": ticker,
+            "close": df["Close"].to_numpy(),
+            "rsi_14": calculate_rsi(df).to_numpy(),
+            "ma200_dist_pct": calculate_ma200_dist(df).to_numpy(),
+        }))
     
-    # 分批写入数据库
-    print("\n💾 开始写入数据库...")
-    for i in range(0, len(all_records), batch_size):
-        batch = all_records[i:i + batch_size]
-        upsert_market_daily(batch)
-        print(f"   已写入 {min(i + batch_size, len(all_records))}/{len(all_records)}")
-        time.sleep(0.2)  # 避免数据库压力过大
+    written = write_batches(bulk_upsert_market_daily, frames_to_records(frames), batch_size) if frames else 0
     
+    print(f"\n📝 总计写入 {written} 条记录")
     print("\n✅ 市场数据回填完成!")
-    return len(all_records)
+    return written
 
 
 def backfill_macro_data(period: str = "2y"):
@@ -132,77 +273,39 @@ def backfill_macro_data(period: str = "2y"):
     print("🌍 开始回填宏观数据")
     print("=" * 60)
     
-    # 获取 VIX 数据
-    print("\n📡 获取 VIX 数据...")
-    vix_df = fetch_yahoo_chart("^VIX", period)
-    
-    # 获取 TNX (10年期国债收益率) 数据
-    print("📡 获取 TNX 数据...")
-    tnx_df = fetch_yahoo_chart("^TNX", period)
-    
-    # 获取 SOXX, QQQ, XLP, XLY 用于计算比率
-    print("📡 获取 SOXX, QQQ, XLP, XLY 数据...")
-    soxx_df = fetch_yahoo_chart("SOXX", period)
-    qqq_df = fetch_yahoo_chart("QQQ", period)
-    xlp_df = fetch_yahoo_chart("XLP", period)
-    xly_df = fetch_yahoo_chart("XLY", period)
+    # VIX、TNX (10年期国债收益率)，以及用于计算比率的 SOXX, QQQ, XLP, XLY
+    print("\n📡 批量获取 VIX, TNX, SOXX, QQQ, XLP, XLY 数据...")
+    charts = download_history(["^VIX", "^TNX", "SOXX", "QQQ", "XLP", "XLY"], period)
+    vix_df = charts.get("^VIX", pd.DataFrame())
     
     # 构建日期索引（使用 VIX 的日期作为基准）
     if vix_df.empty:
         print("❌ VIX 数据获取失败，无法回填宏观数据")
         return 0
     
-    macro_records = []
+    # 一次 concat 按日期对齐所有收盘价，缺失的 ticker 补成全 NaN 列
+    closes = pd.concat(
+        {t: df["Close"] for t, df in charts.items() if not df.empty}, axis=1
+    ).reindex(index=vix_df.index, columns=["^VIX", "^TNX", "SOXX", "QQQ", "XLP", "XLY"])
     
-    for date in vix_df.index:
-        date_str = date.strftime("%Y-%m-%d")
-        
-        # VIX
-        vix_close = float(vix_df.loc[date, "Close"]) if date in vix_df.index else None
-        
-        # TNX
-        tnx_close = None
-        if not tnx_df.empty and date in tnx_df.index:
-            tnx_close = float(tnx_df.loc[date, "Close"])
-        
+    macro = pd.DataFrame({
+        "vix_close": closes["^VIX"],
+        "us10y_yield": closes["^TNX"],
         # SOXX/QQQ 比率
-        soxx_qqq = None
-        if not soxx_df.empty and not qqq_df.empty:
-            if date in soxx_df.index and date in qqq_df.index:
-                soxx_close = float(soxx_df.loc[date, "Close"])
-                qqq_close = float(qqq_df.loc[date, "Close"])
-                if qqq_close > 0:
-                    soxx_qqq = soxx_close / qqq_close
-        
+        "soxx_qqq_ratio": closes["SOXX"] / closes["QQQ"].where(closes["QQQ"] > 0),
         # XLP/XLY 比率（防御/进攻）
-        xlp_xly = None
-        if not xlp_df.empty and not xly_df.empty:
-            if date in xlp_df.index and date in xly_df.index:
-                xlp_close = float(xlp_df.loc[date, "Close"])
-                xly_close = float(xly_df.loc[date, "Close"])
-                if xly_close > 0:
-                    xlp_xly = xlp_close / xly_close
-        
-        record = {
-            "date": date_str,
-            "vix_close": vix_close,
-            "us10y_yield": tnx_close,
-            "soxx_qqq_ratio": soxx_qqq,
-            "xlp_xly_ratio": xlp_xly,
-            "fear_greed_index": None,  # Fear & Greed 无法获取历史数据，只能实时获取
-        }
-        macro_records.append(record)
+        "xlp_xly_ratio": closes["XLP"] / closes["XLY"].where(closes["XLY"] > 0),
+    })
+    macro = macro.astype(object).where(macro.notna(), None)
+    macro.insert(0, "date", vix_df.index.strftime("%Y-%m-%d"))
+    macro["fear_greed_index"] = None  # Fear & Greed 无法获取历史数据，只能实时获取
+    macro_records = macro.to_dict("records")
     
     print(f"\n📝 总计 {len(macro_records)} 条宏观数据待写入")
     
     # 分批写入
-    batch_size = 200
     print("\n💾 开始写入数据库...")
-    for i in range(0, len(macro_records), batch_size):
-        batch = macro_records[i:i + batch_size]
-        upsert_macro(batch)
-        print(f"   已写入 {min(i + batch_size, len(macro_records))}/{len(macro_records)}")
-        time.sleep(0.2)
+    write_batches(bulk_upsert_macro, macro_records)
     
     print("\n✅ 宏观数据回填完成!")
     return len(macro_records)
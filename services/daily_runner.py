@@ -10,11 +10,8 @@ from datetime import datetime, date
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from db_manager import upsert_market_daily, upsert_macro
-from config import TARGET_ETFS, MACRO_TICKERS, L1_TICKERS
-from utils import get_fear_and_greed
-
-# Tickers to watch
-ALL_TICKERS = list(set(TARGET_ETFS + MACRO_TICKERS + L1_TICKERS))
+from config import ALL_TICKERS
+from utils import fetch_fear_and_greed
 
 def get_feishu_webhook():
     return os.getenv("FEISHU_WEBHOOK")
@@ -42,10 +39,10 @@ def calculate_indicators(df):
     if len(df) < 200:
         return None, None
         
-    # RSI 14
+    # RSI 14 (Wilder smoothing, same as the backfill script)
     delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
     rs = gain / loss
     rsi = 100 - (100 / (1 + rs))
     
@@ -60,11 +57,13 @@ def run_daily_job():
     
     # 1. Fetch Data
     print("📡 Fetching data from yfinance...")
-    # Fetch 1 year data to ensure we have enough for MA200
-    data = yf.download(ALL_TICKERS, period="1y", interval="1d", group_by='ticker', auto_adjust=True, progress=False)
+    # Fetch 1 year data to ensure we have enough for MA200.
+    # Unadjusted closes, same as the backfill script, so RSI/MA200 rows from both paths agree
+    data = yf.download(ALL_TICKERS, period="1y", interval="1d", group_by='ticker', auto_adjust=False, progress=False)
     
     market_metrics = []
     macro_data = {}
+    last_close = {}  # ticker -> latest valid close, reused by the macro section
     today_str = date.today().isoformat()
     
     # Alerts container
@@ -95,6 +94,7 @@ def run_daily_job():
             rsi_val = rsi_series.iloc[-1] if rsi_series is not None else None
             dist_val = dist_series.iloc[-1] if dist_series is not None else None
             close_val = float(latest['Close'])
+            last_close[ticker] = close_val
 
             # Store Market Metrics
             # Only store if it's a standard ETF (skip macro indices for this table if preferred, 
@@ -116,20 +116,13 @@ def run_daily_job():
 
     # 3. Process Macro & L1 Indicators
     try:
-        # Re-fetch latest Close for Ratio calculation (using aligned data)
-        # Simplify: Just use the latest close we got from loop or access data directly
-        def get_latest_close(t):
-            try:
-                return float(data[t]['Close'].iloc[-1])
-            except:
-                return None
-        
-        qqq = get_latest_close('QQQ')
-        soxx = get_latest_close('SOXX')
-        xlp = get_latest_close('XLP')
-        xly = get_latest_close('XLY')
-        vix = get_latest_close('^VIX')
-        tnx = get_latest_close('^TNX')
+        # Latest closes were already collected in the ticker loop
+        qqq = last_close.get('QQQ')
+        soxx = last_close.get('SOXX')
+        xlp = last_close.get('XLP')
+        xly = last_close.get('XLY')
+        vix = last_close.get('^VIX')
+        tnx = last_close.get('^TNX')
         
         # Calculate Ratios
         soxx_qqq = soxx / qqq if soxx and qqq else None
@@ -151,7 +144,7 @@ def run_daily_job():
         except Exception as e:
             print(f"⚠️ Failed to fetch Fear & Greed from CNN: {e}")
             # Fallback to utils function
-            fng_score, _ = get_fear_and_greed()
+            fng_score, _ = fetch_fear_and_greed()
         
         macro_record = {
             "date": today_str, # Macro uses run date usually, or latest data date
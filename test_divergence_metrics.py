@@ -1,6 +1,6 @@
 import pandas as pd
 
-from utils import calculate_divergence_metrics
+from utils import analyze_smh_qqq_rs, calculate_divergence_metrics, to_wide
 
 
 def _make_df(values, start="2026-01-01"):
@@ -37,3 +37,18 @@ def test_healthy_trend_signal():
 
     out = calculate_divergence_metrics(qqq, soxx, window=60)
     assert out.iloc[-1]["Divergence_Signal"] == "🟢 趋势健康"
+
+
+def test_smh_qqq_rs_accepts_wide_frame():
+    # QQQ makes a new 20-day high while SMH rolls over: top-divergence warning
+    qqq = _make_df([100 + 0.1 * i for i in range(59)] + [110])
+    smh = _make_df([100 + 0.2 * i for i in range(55)] + [110, 109, 108, 107, 106])
+    stock_data = {"QQQ": qqq, "SMH": smh.iloc[5:], "TLT": _make_df([90.0] * 60)}
+
+    rs_dict, signal_dict = analyze_smh_qqq_rs(stock_data)
+    rs_wide, signal_wide = analyze_smh_qqq_rs(to_wide(stock_data))
+
+    pd.testing.assert_frame_equal(rs_wide, rs_dict, check_freq=False)
+    assert signal_wide == signal_dict == "🔴 预警：硬件动能衰竭（顶背离风险）"
+    assert len(rs_wide) == 55
+    assert analyze_smh_qqq_rs(to_wide({"QQQ": qqq})) == (None, "数据不足")
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from utils import _compute_indicators, _compute_indicators_bulk
+
+
+def _make_df(n, seed):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start="2024-01-01", periods=n, freq="D")
+    return pd.DataFrame({"Close": 100 + rng.standard_normal(n).cumsum()}, index=idx)
+
+
+def test_bulk_indicators_match_per_ticker():
+    frames = {"QQQ": _make_df(300, 1), "SMH": _make_df(220, 2), "TLT": _make_df(40, 3)}
+
+    bulk = _compute_indicators_bulk(frames)
+
+    for ticker, df in frames.items():
+        expected = _compute_indicators(df.copy())
+        pd.testing.assert_frame_equal(bulk[ticker], expected)
+
+
+def _reference_closes():
+    rng = np.random.default_rng(7)
+    idx = pd.date_range(start="2024-01-01", periods=260, freq="D")
+    walk = 100 + rng.standard_normal(260).cumsum()
+    gaps = walk.copy()
+    gaps[:5] = np.nan
+    gaps[60:64] = np.nan
+    gaps[150] = np.nan
+    return pd.DataFrame({"walk": walk, "gaps": gaps, "flat": np.full(260, 50.0)}, index=idx)
+
+
+def _reference(close):
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return {
+        "rsi": 100 - 100 / (1 + gain / loss),
+        "macd": macd,
+        "signal": signal,
+        "mean": close.rolling(20).mean(),
+        "std": close.rolling(20).std(),
+        "sma200": close.rolling(200).mean(),
+    }
+
+
+def _assert_close(actual, expected):
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), expected.to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def test_loops_match_pandas_reference():
+    close = _reference_closes()
+    expected = _reference(close)
+    values = close.to_numpy()
+
+    _assert_close(utils._rsi_loop(values, 14), expected["rsi"])
+    macd, signal, hist = utils._macd_loop(values)
+    _assert_close(macd, expected["macd"])
+    _assert_close(signal, expected["signal"])
+    _assert_close(hist, expected["macd"] - expected["signal"])
+    mean, std = utils._rolling_loop(values, 20)
+    _assert_close(mean, expected["mean"])
+    _assert_close(std, expected["std"])
+
+
+@pytest.mark.parametrize("accelerated", [True, False])
+def test_indicator_helpers_match_pandas_reference(monkeypatch, accelerated):
+    if not accelerated:
+        for name in ("_rsi_kernel", "_macd_kernel", "_rolling_kernel", "bn"):
+            monkeypatch.setattr(utils, name, None)
+    close = _reference_closes()
+    expected = _reference(close)
+
+    for col in close:  # Series and wide-frame paths
+        _assert_close(utils._rsi(close[col]), expected["rsi"][col])
+    _assert_close(utils._rsi(close), expected["rsi"])
+    macd, signal, _ = utils._macd(close)
+    _assert_close(macd, expected["macd"])
+    _assert_close(signal, expected["signal"])
+    mean, std = utils._rolling_mean_std(close, 20)
+    _assert_close(mean, expected["mean"])
+    _assert_close(std, expected["std"])
+    _assert_close(utils._rolling_mean(close, 200), expected["sma200"])
+
+
+def test_bulk_passes_through_computed_frames():
+    computed = _compute_indicators_bulk({"QQQ": _make_df(300, 1)})["QQQ"]
+    raw = _make_df(220, 2)
+
+    bulk = _compute_indicators_bulk({"QQQ": computed, "SMH": raw})
+
+    assert bulk["QQQ"] is computed
+    pd.testing.assert_frame_equal(bulk["SMH"], _compute_indicators(raw.copy()))
@@ -1,3 +1,5 @@
+import threading
+
 import notifications
 
 
@@ -17,6 +19,23 @@ def test_send_feishu_alert_success(monkeypatch):
         return _Resp()
 
     monkeypatch.setenv("FEISHU_WEBHOOK", "https://example.com/webhook")
-    monkeypatch.setattr(notifications.requests, "post", _fake_post)
+    monkeypatch.setattr(notifications._SESSION, "post", _fake_post)
+
+    assert notifications.send_feishu_alert("hello", "world", blocking=True) is True
+
+
+def test_send_feishu_alert_background(monkeypatch):
+    sent = threading.Event()
+
+    class _Resp:
+        status_code = 200
+
+    def _fake_post(url, json=None, timeout=None):
+        sent.set()
+        return _Resp()
+
+    monkeypatch.setenv("FEISHU_WEBHOOK", "https://example.com/webhook")
+    monkeypatch.setattr(notifications._SESSION, "post", _fake_post)
 
     assert notifications.send_feishu_alert("hello", "world") is True
+    assert sent.wait(timeout=5)
@@ -1,28 +1,118 @@
+import asyncio
+import hashlib
+import json
+import os
 import time
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import httpx
+import numpy as np
 import pandas as pd
 import requests
 import streamlit as st
 import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from config import REQUEST_TIMEOUT, YAHOO_USER_AGENT
+from config import FNG_TIMEOUT, HTTP_CACHE_TTL, REQUEST_TIMEOUT, YAHOO_CONCURRENCY, YAHOO_MAX_RETRY_AFTER, YAHOO_USER_AGENT
 
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
 
-def _get_yahoo_session() -> requests.Session:
-    """Create a session with Yahoo-friendly headers."""
-    session = requests.Session()
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+# On-disk indicator cache, shared across Streamlit restarts
+INDICATOR_CACHE_DIR = Path.home() / ".alphapilot_cache" / "indicators"
+INDICATOR_CACHE_TTL = 3600  # seconds
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+# How long (seconds) get_stock_data skips a ticker that just failed to fetch, per session
+FAILED_TICKER_TTL = 60
+
+
+# requests-cache SQLite file (without the .sqlite suffix); override with ALPHAPILOT_HTTP_CACHE,
+# e.g. to point tests/CI at a temporary path
+HTTP_CACHE_PATH = os.getenv("ALPHAPILOT_HTTP_CACHE", str(Path.home() / ".alphapilot_cache" / "http"))
+
+
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Pooled keep-alive session for the sync JSON endpoints (CNN / alternative.me), created on first use.
+    With requests-cache, repeated GETs within HTTP_CACHE_TTL (or what Cache-Control allows)
+    are answered from a local SQLite cache shared across processes.
+    """
+    if requests_cache is not None:
+        session = requests_cache.CachedSession(
+            HTTP_CACHE_PATH,
+            backend="sqlite",
+            expire_after=HTTP_CACHE_TTL,
+            allowable_methods=("GET",),
+            stale_if_error=True,
+            cache_control=True,
+        )
+    else:
+        session = requests.Session()
     session.headers.update({"User-Agent": YAHOO_USER_AGENT})
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            # Only quick retries on 5xx/429 status; no connect/read-timeout retries and no
+            # server-dictated Retry-After sleeps, so FNG_TIMEOUT stays the real upper bound
+            max_retries=Retry(
+                total=2,
+                connect=0,
+                read=0,
+                backoff_factor=0.2,
+                status_forcelist=[429, 502, 503],
+                respect_retry_after_header=False,
+            ),
+        ),
+    )
     return session
 
 
-def _get_yahoo_crumb(session: requests.Session) -> Optional[str]:
+def _get_yahoo_client() -> httpx.AsyncClient:
+    """
+    Create an async client with Yahoo-friendly headers.
+    With h2 installed the concurrent chart requests are multiplexed over one
+    HTTP/2 connection (one handshake) instead of one TLS connection each.
+    """
+    return httpx.AsyncClient(headers={"User-Agent": YAHOO_USER_AGENT}, timeout=REQUEST_TIMEOUT, http2=_HTTP2)
+
+
+async def _get_yahoo_crumb(client: httpx.AsyncClient) -> Optional[str]:
     """Fetch Yahoo crumb lazily; it can fail on some networks."""
     try:
-        resp = session.get(
-            "https://query1.finance.yahoo.com/v1/test/getcrumb",
-            timeout=REQUEST_TIMEOUT,
-        )
+        resp = await client.get("https://query1.finance.yahoo.com/v1/test/getcrumb")
         if resp.status_code == 200:
             return resp.text.strip()
     except Exception:
@@ -30,10 +120,55 @@ def _get_yahoo_crumb(session: requests.Session) -> Optional[str]:
     return None
 
 
-def _fetch_from_yahoo_chart_api(
-    ticker: str, period: str = "2y", session: Optional[requests.Session] = None, crumb: Optional[str] = None
+async def _fetch_json(
+    client: httpx.AsyncClient, url: str, params: Optional[dict] = None
+) -> Tuple[int, Optional[dict], float]:
+    """GET a JSON endpoint. Returns (status_code, payload, retry_after seconds); never raises."""
+    try:
+        resp = await client.get(url, params=params)
+        if resp.status_code != 200:
+            return resp.status_code, None, _retry_after(resp)
+        return resp.status_code, _loads(resp.content), 0.0
+    except Exception:
+        return 0, None, 0.0
+
+
+def _retry_after(resp: httpx.Response) -> float:
+    """Seconds from a Retry-After header (delta-seconds form only), capped at YAHOO_MAX_RETRY_AFTER."""
+    try:
+        return min(max(float(resp.headers.get("Retry-After", 0)), 0.0), float(YAHOO_MAX_RETRY_AFTER))
+    except ValueError:
+        return 0.0
+
+
+def _loads(content: bytes):
+    """Parse a JSON body; orjson when available (much faster on the float-heavy chart payloads)."""
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+def _chart_payload_to_df(data: dict) -> pd.DataFrame:
+    result = data["chart"]["result"][0]
+
+    timestamps = result["timestamp"]
+    quote = result["indicators"]["quote"][0]
+
+    # One contiguous float64 block (None -> NaN) instead of five per-column lists;
+    # rows without a Close are dropped on the array before any frame is built
+    arr = np.array(
+        [quote["open"], quote["high"], quote["low"], quote["close"], quote["volume"]], dtype=np.float64
+    ).T
+    mask = ~np.isnan(arr[:, 3])
+    # Timestamps are the session open (e.g. 14:30 UTC); normalize to dates so frames align with yfinance's
+    index = pd.to_datetime(np.asarray(timestamps, dtype=np.int64)[mask], unit="s", cache=True).normalize()
+    df = pd.DataFrame(arr[mask], index=index, columns=["Open", "High", "Low", "Close", "Volume"])
+
+    df.index.name = "Date"
+    return df
+
+
+async def _fetch_from_yahoo_chart_api(
+    client: httpx.AsyncClient, ticker: str, period: str = "2y", crumb: Optional[str] = None
 ) -> Optional[pd.DataFrame]:
-    session = session or _get_yahoo_session()
     period_map = {"1y": "1y", "2y": "2y", "5y": "5y"}
     range_val = period_map.get(period, "2y")
 
@@ -46,115 +181,527 @@ def _fetch_from_yahoo_chart_api(
     if crumb:
         params["crumb"] = crumb
 
+    status, data, retry_after = await _fetch_json(client, url, params)
+    if status == 429 and crumb is None:
+        # Only wait when Yahoo actually throttled us, and only as long as it asked
+        if retry_after:
+            await asyncio.sleep(retry_after)
+        crumb = await _get_yahoo_crumb(client)
+        if crumb:
+            params["crumb"] = crumb
+            status, data, _ = await _fetch_json(client, url, params)
+
+    if data is None:
+        return None
     try:
-        response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        if response.status_code == 429 and crumb is None:
-            crumb = _get_yahoo_crumb(session)
+        return _chart_payload_to_df(data)
+    except Exception:
+        return None
+
+
+async def _fetch_all_from_yahoo_chart_api(tickers: List[str], period: str) -> List[Optional[pd.DataFrame]]:
+    """Fan out chart requests for all tickers, at most YAHOO_CONCURRENCY in flight; retry failures once with a crumb."""
+    semaphore = asyncio.Semaphore(YAHOO_CONCURRENCY)
+
+    async def bounded_fetch(client: httpx.AsyncClient, ticker: str, crumb: Optional[str] = None):
+        async with semaphore:
+            return await _fetch_from_yahoo_chart_api(client, ticker, period, crumb=crumb)
+
+    async with _get_yahoo_client() as client:
+        results = await asyncio.gather(*(bounded_fetch(client, t) for t in tickers), return_exceptions=True)
+        frames = [r if isinstance(r, pd.DataFrame) else None for r in results]
+
+        missing = [i for i, df in enumerate(frames) if df is None]
+        if missing:
+            crumb = await _get_yahoo_crumb(client)
             if crumb:
-                params["crumb"] = crumb
-                response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
-
-        if response.status_code == 200:
-            data = response.json()
-            result = data["chart"]["result"][0]
-
-            timestamps = result["timestamp"]
-            quote = result["indicators"]["quote"][0]
-
-            df = pd.DataFrame(
-                {
-                    "Open": quote["open"],
-                    "High": quote["high"],
-                    "Low": quote["low"],
-                    "Close": quote["close"],
-                    "Volume": quote["volume"],
-                },
-                index=pd.to_datetime(timestamps, unit="s"),
-            )
+                retried = await asyncio.gather(
+                    *(bounded_fetch(client, tickers[i], crumb) for i in missing), return_exceptions=True
+                )
+                for i, r in zip(missing, retried):
+                    if isinstance(r, pd.DataFrame):
+                        frames[i] = r
+    return frames
+
+
+def _fetch_from_yfinance(tickers: List[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+    """Fallback to yfinance which handles cookies/crumb internally; one batched download for all tickers."""
+    frames: Dict[str, pd.DataFrame] = {}
+    try:
+        data = yf.download(
+            tickers,
+            period=period,
+            interval="1d",
+            group_by="ticker",
+            threads=True,
+            progress=False,
+            auto_adjust=False,
+        )
+    except Exception:
+        return frames
+    if data is None or data.empty:
+        return frames
 
+    if not isinstance(data.columns, pd.MultiIndex):  # older yfinance returns flat columns for one ticker
+        data = pd.concat({tickers[0]: data}, axis=1)
+    available = set(data.columns.get_level_values(0))
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        df = data[ticker][["Open", "High", "Low", "Close", "Volume"]].dropna(subset=["Close"])
+        if not df.empty:
             df.index.name = "Date"
-            return df.dropna(subset=["Close"])
-    except Exception:
-        return None
-    return None
+            frames[ticker] = df
+    return frames
+
+
+def _like(close, values: np.ndarray):
+    """Wrap a 1-D/2-D result array with the index (and name/columns) of `close`."""
+    if isinstance(close, pd.DataFrame):
+        return pd.DataFrame(values, index=close.index, columns=close.columns)
+    return pd.Series(values, index=close.index, name=close.name)
+
+
+def _rolling_mean(close, window: int):
+    """
+    `close.rolling(window).mean()` on bottleneck's moving-window kernel, else as
+    an O(N) cumulative-sum difference. NaNs count as missing, so any window
+    holding one is NaN, as in pandas.
+    """
+    values = close.to_numpy(dtype=np.float64)
+    if bn is not None and window <= len(values):  # bottleneck rejects windows longer than the data
+        return _like(close, bn.move_mean(values, window, min_count=window, axis=0))
+    valid = ~np.isnan(values)
+    zero = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zero, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    count = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    out = np.full(values.shape, np.nan)
+    if window <= len(values):
+        sums = csum[window:] - csum[:-window]
+        full = (count[window:] - count[:-window]) == window
+        out[window - 1:] = np.where(full, sums / window, np.nan)
+    return _like(close, out)
+
+
+def _rolling_loop(close: np.ndarray, window: int):
+    """
+    Rolling mean and sample std (ddof=1) over each column of a 2-D array in one
+    pass, with Welford add/remove updates. A window containing NaN yields NaN,
+    matching pandas `rolling(window)` defaults.
+    """
+    n, k = close.shape
+    mean_out = np.full((n, k), np.nan)
+    std_out = np.full((n, k), np.nan)
+    for j in range(k):
+        nobs = 0
+        mean = 0.0
+        ssqdm = 0.0
+        for i in range(n):
+            if i >= window:
+                y = close[i - window, j]
+                if not np.isnan(y):
+                    nobs -= 1
+                    if nobs > 0:
+                        delta = y - mean
+                        mean -= delta / nobs
+                        ssqdm -= delta * (y - mean)
+                    else:
+                        mean = 0.0
+                        ssqdm = 0.0
+            x = close[i, j]
+            if not np.isnan(x):
+                nobs += 1
+                delta = x - mean
+                mean += delta / nobs
+                ssqdm += delta * (x - mean)
+            if nobs == window:
+                mean_out[i, j] = mean
+                if window > 1:
+                    std_out[i, j] = np.sqrt(max(ssqdm, 0.0) / (window - 1))
+    return mean_out, std_out
+
+
+_rolling_kernel = njit(cache=True)(_rolling_loop) if njit is not None else None
+
+
+def _rolling_mean_std(close, window: int):
+    """Rolling mean and sample std of `close`: one fused numba pass, else bottleneck, else pandas."""
+    if _rolling_kernel is not None:
+        values = close.to_numpy(dtype=np.float64)
+        mean, std = _rolling_kernel(values.reshape(len(values), -1), window)
+        if values.ndim == 1:
+            mean, std = mean[:, 0], std[:, 0]
+        return _like(close, mean), _like(close, std)
+    if bn is None or window > len(close):
+        rolling = close.rolling(window=window)
+        return rolling.mean(), rolling.std()
+    values = close.to_numpy(dtype=np.float64)
+    return (
+        _like(close, bn.move_mean(values, window, min_count=window, axis=0)),
+        _like(close, bn.move_std(values, window, min_count=window, axis=0, ddof=1)),
+    )
+
+
+def _ema_step(e: float, x: float, alpha: float, gap: int) -> float:
+    """One `ewm(adjust=False)` update after `gap` steps (1 = no missing values in between)."""
+    old_wt = (1.0 - alpha) ** gap
+    return (old_wt * e + alpha * x) / (old_wt + alpha)
+
+
+def _rsi_loop(close: np.ndarray, window: int) -> np.ndarray:
+    """
+    Wilder RSI over each column of a 2-D array: gains and losses smoothed with
+    alpha = 1/window in one pass. Follows pandas `ewm(alpha, adjust=False,
+    min_periods=window)` on the close diffs, NaN gaps included.
+    """
+    n, k = close.shape
+    alpha = 1.0 / window
+    out = np.full((n, k), np.nan)
+    for j in range(k):
+        started = False
+        gap = 0
+        count = 0
+        g = 0.0
+        l = 0.0
+        prev = np.nan
+        for i in range(n):
+            c = close[i, j]
+            d = c - prev
+            prev = c
+            if np.isnan(d):
+                if started:
+                    gap += 1
+            else:
+                gi = d if d > 0 else 0.0
+                li = -d if d < 0 else 0.0
+                if not started:
+                    started = True
+                    g = gi
+                    l = li
+                else:
+                    g = _ema_step(g, gi, alpha, gap + 1)
+                    l = _ema_step(l, li, alpha, gap + 1)
+                gap = 0
+                count += 1
+            if count >= window:
+                if l > 0:
+                    out[i, j] = 100.0 - 100.0 / (1.0 + g / l)
+                elif g > 0:
+                    out[i, j] = 100.0
+    return out
+
+
+if njit is not None:
+    _ema_step = njit(cache=True)(_ema_step)
+    _rsi_kernel = njit(cache=True)(_rsi_loop)
+else:
+    _rsi_kernel = None
+
+
+def _rsi(close, window: int = 14):
+    """Wilder RSI of a Close Series or wide frame; one fused numba pass when available."""
+    if _rsi_kernel is None:
+        delta = close.diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+    values = close.to_numpy(dtype=np.float64)
+    out = _rsi_kernel(values.reshape(len(values), -1), window)
+    return _like(close, out if values.ndim == 2 else out[:, 0])
+
+
+def _macd_loop(close: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MACD(12, 26, 9) over each column of a 2-D array with the three EMAs carried in
+    one loop. Follows pandas `ewm(span, adjust=False)`: output starts at the first
+    valid close and holds its value across NaNs, which decay the old weight.
+    """
+    n, k = close.shape
+    a12 = 2.0 / 13.0
+    a26 = 2.0 / 27.0
+    a9 = 2.0 / 10.0
+    macd = np.full((n, k), np.nan)
+    signal = np.full((n, k), np.nan)
+    for j in range(k):
+        started = False
+        gap = 0
+        e12 = 0.0
+        e26 = 0.0
+        sig = 0.0
+        for i in range(n):
+            c = close[i, j]
+            if np.isnan(c):
+                if started:
+                    # MACD itself has no gap, so the signal line keeps smoothing the held value
+                    gap += 1
+                    sig = _ema_step(sig, e12 - e26, a9, 1)
+                    macd[i, j] = e12 - e26
+                    signal[i, j] = sig
+                continue
+            if not started:
+                started = True
+                e12 = c
+                e26 = c
+                sig = 0.0
+            else:
+                e12 = _ema_step(e12, c, a12, gap + 1)
+                e26 = _ema_step(e26, c, a26, gap + 1)
+                sig = _ema_step(sig, e12 - e26, a9, 1)
+            gap = 0
+            macd[i, j] = e12 - e26
+            signal[i, j] = sig
+    return macd, signal, macd - signal
+
+
+_macd_kernel = njit(cache=True)(_macd_loop) if njit is not None else None
+
+
+def _macd(close):
+    """(MACD, signal, histogram) of a Close Series or wide frame; one fused numba pass when available."""
+    if _macd_kernel is None:
+        exp12 = close.ewm(span=12, adjust=False).mean()
+        exp26 = close.ewm(span=26, adjust=False).mean()
+        macd = exp12 - exp26
+        signal = macd.ewm(span=9, adjust=False).mean()
+        return macd, signal, macd - signal
+    values = close.to_numpy(dtype=np.float64)
+    outs = _macd_kernel(values.reshape(len(values), -1))
+    return tuple(_like(close, out if values.ndim == 2 else out[:, 0]) for out in outs)
+
+
+def _indicator_columns(close):
+    """Indicator math on a Close Series, or a wide frame of Closes (one column per ticker)."""
+    cols = {}
+    # Too short for a 200-day window: skip the rolling pass, the column is all NaN anyway
+    missing = _like(close, np.full(close.shape, np.nan))
+    cols["SMA_200"] = _rolling_mean(close, 200) if len(close) >= 200 else missing
+    # shared by SMA_20 and the bands
+    sma_20, bb_std = _rolling_mean_std(close, 20) if len(close) >= 20 else (missing, missing)
+    cols["SMA_20"] = sma_20
+
+    cols["RSI"] = _rsi(close, 14)
+
+    cols["MACD"], cols["MACD_Signal"], cols["MACD_Hist"] = _macd(close)
+
+    cols["BB_Middle"] = sma_20
+    cols["BB_Std"] = bb_std
+    cols["BB_Upper"] = cols["BB_Middle"] + (2 * cols["BB_Std"])
+    cols["BB_Lower"] = cols["BB_Middle"] - (2 * cols["BB_Std"])
+
+    cols["Dist_MA200_Pct"] = ((close - cols["SMA_200"]) / cols["SMA_200"]) if len(close) >= 200 else missing
+    return cols
+
+
+# Indicators are stored as float32 (plenty for equity prices, half the bytes per cache entry);
+# the math itself runs in float64 and the raw OHLCV columns are left untouched
+INDICATOR_DTYPE = np.float32
+
+
+INDICATOR_COLUMNS = (
+    "SMA_200", "SMA_20", "RSI", "MACD", "MACD_Signal", "MACD_Hist",
+    "BB_Middle", "BB_Std", "BB_Upper", "BB_Lower", "Dist_MA200_Pct",
+)
+
+
+def _has_indicators(df: pd.DataFrame) -> bool:
+    """True if every indicator column is already present (e.g. served from a cache)."""
+    return all(col in df for col in INDICATOR_COLUMNS)
 
 
-def _fetch_from_yfinance(ticker: str, period: str = "2y") -> Optional[pd.DataFrame]:
-    """Fallback to yfinance which handles cookies/crumb internally."""
+def _compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    if _has_indicators(df):
+        return df
+    # One assign of all columns instead of a column-by-column insert into the BlockManager
+    return df.assign(
+        **{name: values.to_numpy(dtype=INDICATOR_DTYPE) for name, values in _indicator_columns(df["Close"]).items()}
+    )
+
+
+def _compute_indicators_bulk(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Compute indicators for many tickers with one rolling/ewm call per indicator.
+    Closes are right-aligned by row position (not by date) so each column only
+    ever sees its own ticker's history, matching `_compute_indicators` exactly.
+    Frames that already carry every indicator column are passed through untouched.
+    """
+    pending = {t: df for t, df in frames.items() if not _has_indicators(df)}
+    if not pending:
+        return dict(frames)
+    n = max(len(df) for df in pending.values())
+    closes = pd.DataFrame(
+        {t: np.concatenate([np.full(n - len(df), np.nan), df["Close"].to_numpy(dtype=float)]) for t, df in pending.items()}
+    )
+    wide = _indicator_columns(closes)
+
+    out: Dict[str, pd.DataFrame] = {}
+    for t, df in frames.items():
+        if t not in pending:
+            out[t] = df
+            continue
+        start = n - len(df)
+        out[t] = df.assign(
+            **{name: values[t].to_numpy(dtype=INDICATOR_DTYPE)[start:] for name, values in wide.items()}
+        )
+    return out
+
+
+def _indicator_cache_path(ticker: str, period: str) -> Path:
+    """One cache file per (ticker, period), overwritten on refresh so the directory stays bounded."""
+    key = hashlib.blake2b(f"{ticker}|{period}".encode(), digest_size=8).hexdigest()
+    return INDICATOR_CACHE_DIR / f"{key}.parquet"
+
+
+def _read_indicator_cache(path: Path, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Cached frame if < TTL old and computed from the same bar set (today's bar moves intraday)."""
     try:
-        df = yf.download(ticker, period=period, interval="1d", progress=False, auto_adjust=False)
-        if df is None or df.empty:
+        if time.time() - path.stat().st_mtime >= INDICATOR_CACHE_TTL:
             return None
-        df.index.name = "Date"
-        df = df[["Open", "High", "Low", "Close", "Volume"]].dropna(subset=["Close"])
-        return df
+        cached = pd.read_parquet(path)
+        if (
+            len(cached) == len(df)
+            and cached.index[-1] == df.index[-1]
+            and float(cached["Close"].iloc[-1]) == float(df["Close"].iloc[-1])
+        ):
+            return cached
     except Exception:
-        return None
+        pass
+    return None
 
 
-def _compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    df["SMA_200"] = df["Close"].rolling(window=200).mean()
-    df["SMA_20"] = df["Close"].rolling(window=20).mean()
-
-    delta = df["Close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df["RSI"] = 100 - (100 / (1 + rs))
-
-    exp12 = df["Close"].ewm(span=12, adjust=False).mean()
-    exp26 = df["Close"].ewm(span=26, adjust=False).mean()
-    df["MACD"] = exp12 - exp26
-    df["MACD_Signal"] = df["MACD"].ewm(span=9, adjust=False).mean()
-    df["MACD_Hist"] = df["MACD"] - df["MACD_Signal"]
-
-    df["BB_Middle"] = df["Close"].rolling(window=20).mean()
-    df["BB_Std"] = df["Close"].rolling(window=20).std()
-    df["BB_Upper"] = df["BB_Middle"] + (2 * df["BB_Std"])
-    df["BB_Lower"] = df["BB_Middle"] - (2 * df["BB_Std"])
-
-    df["Dist_MA200_Pct"] = ((df["Close"] - df["SMA_200"]) / df["SMA_200"])
-    return df
+def _write_indicator_cache(path: Path, df: pd.DataFrame) -> None:
+    # A failed cache write must not break the fetch
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(path)
+    except Exception:
+        pass
 
 
-@st.cache_data(ttl=3600)
-def get_stock_data(tickers: List[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+def _prune_indicator_cache() -> None:
+    """Drop expired files (tickers no longer requested, older cache layouts)."""
+    cutoff = time.time() - INDICATOR_CACHE_TTL
+    for path in INDICATOR_CACHE_DIR.glob("*.parquet"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _compute_indicators_cached(frames: Dict[str, pd.DataFrame], period: str) -> Dict[str, pd.DataFrame]:
+    """`_compute_indicators_bulk`, skipping tickers whose bar set was already computed (on disk, < TTL old)."""
+    out: Dict[str, pd.DataFrame] = {}
+    pending: Dict[str, pd.DataFrame] = {}
+    for ticker, df in frames.items():
+        cached = _read_indicator_cache(_indicator_cache_path(ticker, period), df)
+        if cached is not None:
+            _CACHE_STATS["hits"] += 1
+            out[ticker] = cached
+        else:
+            _CACHE_STATS["misses"] += 1
+            pending[ticker] = df
+
+    if pending:
+        _prune_indicator_cache()
+    for ticker, df in _compute_indicators_bulk(pending).items():
+        _write_indicator_cache(_indicator_cache_path(ticker, period), df)
+        out[ticker] = df
+    return {ticker: out[ticker] for ticker in frames}
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Hit/miss counts of the on-disk indicator cache since process start."""
+    return dict(_CACHE_STATS)
+
+
+def _get_stock_data_impl(tickers: Sequence[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
     """
     Fetch historical data for a list of tickers.
-    Tries Yahoo Chart API with crumb, then falls back to yfinance.
+    Requests all tickers from the Yahoo Chart API concurrently (retrying with a
+    crumb on failure), then fetches any missing tickers in one yfinance batch.
     """
-    data: Dict[str, pd.DataFrame] = {}
-    session = _get_yahoo_session()
-    crumb: Optional[str] = None
+    frames = asyncio.run(_fetch_all_from_yahoo_chart_api(list(tickers), period))
+    data: Dict[str, pd.DataFrame] = {t: df for t, df in zip(tickers, frames) if df is not None and not df.empty}
+
+    missing = [t for t in tickers if t not in data]
+    if missing:
+        fallback = _fetch_from_yfinance(missing, period)
+        for ticker in missing:
+            if ticker in fallback:
+                data[ticker] = fallback[ticker]
+            else:
+                st.warning(f"{ticker} 数据获取失败（API 被限流或网络问题），请稍后重试或刷新")
+        # Keep the caller's ticker order
+        data = {t: data[t] for t in tickers if t in data}
+
+    return _compute_indicators_cached(data, period)
+
+
+class _CacheMiss(Exception):
+    """Raised by `_get_ticker_data` for an uncached ticker; exceptions are never cached."""
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _get_ticker_data(ticker: str, period: str, _frame: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Per-ticker cache unit, so editing the watchlist only refetches the tickers that changed.
+    Never fetches itself: without `_frame` (unhashed) it only answers hits; with it, it stores.
+    """
+    if _frame is None:
+        raise _CacheMiss(ticker)
+    return _frame
+
 
+def get_stock_data(tickers: Sequence[str], period: str = "2y") -> Dict[str, pd.DataFrame]:
+    """
+    Cached entry point for the Streamlit app; scripts call `_get_stock_data_impl` directly.
+    Hits come from the per-ticker cache; all misses are fetched in one batched
+    `_get_stock_data_impl` call and then stored per ticker. Failures are not cached,
+    but a ticker that just failed is skipped for FAILED_TICKER_TTL seconds in this
+    session, so widget reruns don't refetch delisted/throttled tickers every time.
+    """
+    failed = st.session_state.setdefault("_failed_tickers", {})  # (ticker, period) -> failed_at
+    now = time.time()
+    data: Dict[str, pd.DataFrame] = {}
+    misses = []
     for ticker in tickers:
         try:
-            df = _fetch_from_yahoo_chart_api(ticker, period, session=session, crumb=crumb)
-            if df is None and crumb is None:
-                crumb = _get_yahoo_crumb(session)
-                if crumb:
-                    df = _fetch_from_yahoo_chart_api(ticker, period, session=session, crumb=crumb)
-
-            if df is None or df.empty:
-                df = _fetch_from_yfinance(ticker, period)
-
-            if df is not None and not df.empty:
-                df = _compute_indicators(df)
-                data[ticker] = df
+            data[ticker] = _get_ticker_data(ticker, period)
+        except _CacheMiss:
+            if now - failed.get((ticker, period), float("-inf")) >= FAILED_TICKER_TTL:
+                misses.append(ticker)
+
+    if misses:
+        fetched = _get_stock_data_impl(misses, period)
+        for ticker in misses:
+            if ticker in fetched:
+                data[ticker] = _get_ticker_data(ticker, period, _frame=fetched[ticker])
+                failed.pop((ticker, period), None)
             else:
-                st.warning(f"{ticker} 数据获取失败（API 被限流或网络问题），请稍后重试或刷新")
-        except Exception as e:
-            st.warning(f"获取 {ticker} 数据时出错: {e}")
+                failed[(ticker, period)] = now
+    return {t: data[t] for t in tickers if t in data}
 
-        time.sleep(0.3)  # Avoid rate limiting
 
-    return data
+def _fetch_cnn_fear_and_greed(url: str, headers: Dict[str, str]) -> Optional[Tuple[float, str]]:
+    r = _get_session().get(url, headers=headers, timeout=FNG_TIMEOUT)
+    if r.status_code != 200:
+        return None
+    data = _loads(r.content)
+    if "fear_and_greed" in data:
+        fng_value = data["fear_and_greed"]["score"]
+        fng_rating = data["fear_and_greed"]["rating"]
+        return float(fng_value), fng_rating
+    if "score" in data:
+        return float(data["score"]), data.get("rating", "Unknown")
+    return None
 
 
-@st.cache_data(ttl=3600)
-def get_fear_and_greed() -> Tuple[Optional[float], str]:
+def fetch_fear_and_greed() -> Tuple[Optional[float], str]:
     """
     Fetches CNN Fear & Greed Index with fallback.
+    Both CNN endpoints are queried concurrently and the first usable answer wins;
+    alternative.me is only tried if neither CNN endpoint succeeds.
     """
     urls = [
         "https://production.dataviz.cnn.io/index/fearandgreed/graphdata",
@@ -166,25 +713,25 @@ def get_fear_and_greed() -> Tuple[Optional[float], str]:
         "Referer": "https://www.cnn.com/markets/fear-and-greed",
     }
 
-    for url in urls:
-        try:
-            r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-            if r.status_code == 200:
-                data = r.json()
-                if "fear_and_greed" in data:
-                    fng_value = data["fear_and_greed"]["score"]
-                    fng_rating = data["fear_and_greed"]["rating"]
-                    return float(fng_value), fng_rating
-                if "score" in data:
-                    return float(data["score"]), data.get("rating", "Unknown")
-        except Exception:
-            continue
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    futures = [executor.submit(_fetch_cnn_fear_and_greed, url, headers) for url in urls]
+    try:
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            if result is not None:
+                return result
+    finally:
+        # Don't wait on the slower endpoint once we have an answer
+        executor.shutdown(wait=False, cancel_futures=True)
 
     try:
         alt_url = "https://api.alternative.me/fng/?limit=1"
-        r = requests.get(alt_url, headers={"User-Agent": YAHOO_USER_AGENT}, timeout=REQUEST_TIMEOUT)
+        r = _get_session().get(alt_url, timeout=FNG_TIMEOUT)
         if r.status_code == 200:
-            data = r.json()
+            data = _loads(r.content)
             if "data" in data and len(data["data"]) > 0:
                 fng_value = int(data["data"][0]["value"])
                 fng_rating = data["data"][0]["value_classification"]
@@ -195,40 +742,51 @@ def get_fear_and_greed() -> Tuple[Optional[float], str]:
     return None, "数据获取失败"
 
 
-def analyze_smh_qqq_rs(stock_data: Dict[str, pd.DataFrame]) -> Tuple[Optional[pd.DataFrame], str]:
+# Cached entry point for the Streamlit app; scripts call the uncached `fetch_fear_and_greed`
+get_fear_and_greed = st.cache_data(ttl=3600)(fetch_fear_and_greed)
+
+
+def to_wide(stock_data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    All tickers in one date-aligned frame with (ticker, field) columns, built with a
+    single concat; pair-wise lookups become column slices, e.g. wide[("QQQ", "Close")].
+    """
+    frames = {t: df for t, df in stock_data.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1, sort=True)
+
+
+def analyze_smh_qqq_rs(stock_data) -> Tuple[Optional[pd.DataFrame], str]:
     """
     Compute SMH/QQQ relative strength and detect hardware-vs-index divergence.
+    Accepts the per-ticker dict from `get_stock_data` or its `to_wide` frame.
     Returns (rs_df, signal_str) where rs_df has RS and normalized RS.
     """
-    smh_df = stock_data.get("SMH")
-    qqq_df = stock_data.get("QQQ")
-    if smh_df is None or qqq_df is None:
+    wide = stock_data if isinstance(stock_data, pd.DataFrame) else to_wide(
+        {t: stock_data[t][["Close"]] for t in ("SMH", "QQQ") if stock_data.get(t) is not None}
+    )
+    if ("SMH", "Close") not in wide or ("QQQ", "Close") not in wide:
         return None, "数据不足"
 
-    # Align by date intersection to avoid NaN
-    common_index = smh_df.index.intersection(qqq_df.index)
-    if len(common_index) < 25:
+    # Dates where both have a close, then work on plain ndarrays
+    pair = wide[[("SMH", "Close"), ("QQQ", "Close")]].dropna()
+    index = pair.index
+    if len(index) < 25:
         return None, "数据不足"
 
-    df = pd.DataFrame(index=common_index)
-    df["SMH"] = smh_df.loc[common_index, "Close"]
-    df["QQQ"] = qqq_df.loc[common_index, "Close"]
-    df["RS"] = df["SMH"] / df["QQQ"]
-    df["RS_norm"] = df["RS"] / df["RS"].iloc[0]
+    smh, qqq = pair.to_numpy(dtype=np.float64).T
+    rs = smh / qqq
+    df = pd.DataFrame({"SMH": smh, "QQQ": qqq, "RS": rs, "RS_norm": rs / rs[0]}, index=index)
 
     # Divergence detection
     window = 20
     if len(df) <= window:
         return df, "数据不足"
 
-    qqq_last = df["QQQ"].iloc[-1]
-    smh_last = df["SMH"].iloc[-1]
-    qqq_high_20 = df["QQQ"].iloc[-window - 1 : -1].max()
-    smh_high_20 = df["SMH"].iloc[-window - 1 : -1].max()
-
-    qqq_new_high = qqq_last > qqq_high_20
-    smh_new_high = smh_last > smh_high_20
-    rs_turning_down = df["RS"].diff().tail(3).mean() < 0
+    qqq_new_high = qqq[-1] > qqq[-window - 1 : -1].max()
+    smh_new_high = smh[-1] > smh[-window - 1 : -1].max()
+    rs_turning_down = np.diff(rs[-4:]).mean() < 0
 
     signal = "⚪️ 暂无背离"
     if qqq_new_high and (not smh_new_high) and rs_turning_down:
@@ -284,15 +842,21 @@ def calculate_divergence_metrics(
     out["QQQ_RollingMax"] = out["QQQ_Close"].rolling(window=window, min_periods=1).max()
     out["SOXX_RollingMax"] = out["SOXX_Close"].rolling(window=window, min_periods=1).max()
 
-    # Avoid division by zero
-    out["QQQ_DD"] = (out["QQQ_Close"] - out["QQQ_RollingMax"]) / out["QQQ_RollingMax"].replace(0, pd.NA)
-    out["SOXX_DD"] = (out["SOXX_Close"] - out["SOXX_RollingMax"]) / out["SOXX_RollingMax"].replace(0, pd.NA)
+    # Avoid division by zero; stays float64 (no pd.NA / object promotion)
+    for name in ("QQQ", "SOXX"):
+        close = out[f"{name}_Close"].to_numpy(dtype=np.float64)
+        rolling_max = out[f"{name}_RollingMax"].to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[f"{name}_DD"] = np.where(rolling_max > 0, (close - rolling_max) / rolling_max, np.nan)
 
     severe = (out["QQQ_DD"] > -0.02) & (out["SOXX_DD"] < -0.07)
     mild = (out["QQQ_DD"] > -0.02) & (out["SOXX_DD"] < -0.04)
 
-    out["Divergence_Signal"] = "🟢 趋势健康"
-    out.loc[mild, "Divergence_Signal"] = "🟠 轻微背离"
-    out.loc[severe, "Divergence_Signal"] = "🔴 严重背离"
+    # Severe first: np.select takes the first matching condition
+    signals = ["🔴 严重背离", "🟠 轻微背离", "🟢 趋势健康"]
+    out["Divergence_Signal"] = pd.Categorical(
+        np.select([severe.to_numpy(), mild.to_numpy()], signals[:2], default=signals[2]),
+        categories=signals[::-1],
+    )
 
     return out